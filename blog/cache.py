@@ -0,0 +1,86 @@
+"""
+Blog cache helpers
+
+Generations are opaque tokens stored in the default cache. Anything built
+from the database keeps the generation it was built with and is considered
+stale as soon as the stored token changes. With a cache shared by all the
+workers, a bump in one process invalidates every process.
+
+Every model rendered by the read endpoints has its own generation, bumped
+on any save or delete of one of its rows (see blog.signals) and by the bulk
+writes that bypass signals.
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY_PREFIX = "blog:generation:"
+MODEL_GENERATION_PREFIX = "model:"
+
+
+def get_generation(name):
+    """
+    Get the current generation token of name
+    :param name:
+    :return:
+    """
+    key = GENERATION_KEY_PREFIX + name
+    generation = cache.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        if not cache.add(key, generation, timeout=None):
+            generation = cache.get(key, generation)
+    return generation
+
+
+def get_generations(names):
+    """
+    Get the current generation tokens of names, with one cache round trip
+    when they all exist
+    :param names:
+    :return: mapping of name to token
+    """
+    keys = {GENERATION_KEY_PREFIX + name: name for name in names}
+    found = cache.get_many(list(keys))
+    return {
+        name: found[key] if key in found else get_generation(name)
+        for key, name in keys.items()
+    }
+
+
+def get_model_generation_name(model):
+    """
+    Get the generation name of a model
+    :param model:
+    :return:
+    """
+    return MODEL_GENERATION_PREFIX + model._meta.label_lower
+
+
+def bump_generation(name, using=None):
+    """
+    Replace the generation token of name, now and once the current
+    transaction commits, so a reader that rebuilds in between does not
+    keep uncommitted or outdated data under the new token
+    :param name:
+    :param using:
+    :return:
+    """
+
+    def bump():
+        cache.set(GENERATION_KEY_PREFIX + name, uuid.uuid4().hex, timeout=None)
+
+    bump()
+    transaction.on_commit(bump, using=using)
+
+
+def bump_model_generation(model, using=None):
+    """
+    Invalidate everything built from the rows of model
+    :param model:
+    :param using:
+    :return:
+    """
+    bump_generation(get_model_generation_name(model), using=using)
@@ -0,0 +1,142 @@
+"""
+Blog conditional requests
+
+List and retrieve responses carry validators computed without rendering.
+ETags are built from the generations of the rendered models (see
+blog.cache), which cost no query as any write to those models, counter
+updates included, replaces a generation; object ETags add the object's pk
+and updated_at. No Last-Modified is sent: representations carry counters
+and embedded rows whose writes leave updated_at alone, so If-Modified-Since
+would answer 304 to outdated copies. A request whose validators match gets
+a 304 before any serialization.
+
+Validators are only sent with CONDITIONAL_GET, on by default when the cache
+is shared by every worker: generations kept in a per-process cache would
+not see the writes of the other workers.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .cache import get_generations, get_model_generation_name
+
+
+class ConditionalGetMixin:
+    """
+    Answer list and retrieve with 304 when the client copy is current
+    """
+
+    request = None
+    # every model the representation is built from
+    cache_models = ()
+
+    def is_conditional(self):
+        """
+        Whether validators cover the representation of this request
+        :return:
+        """
+        return settings.CONDITIONAL_GET
+
+    def get_etag_dependencies(self):
+        """
+        Get values, besides the rows themselves, the representation depends on
+        :return:
+        """
+        return ()
+
+    def make_etag(self, *parts):
+        """
+        Make an ETag from the request path, the negotiated media type and parts
+        :param parts:
+        :return:
+        """
+        value = "\0".join(
+            str(part)
+            for part in (
+                self.request.get_full_path(),
+                self.request.accepted_media_type,
+                *self.get_etag_dependencies(),
+                *parts,
+            )
+        )
+        return '"%s"' % hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+
+    def get_generations(self):
+        """
+        Get the generations of the rendered models
+        :return:
+        """
+        generations = get_generations(
+            [get_model_generation_name(model) for model in self.cache_models]
+        )
+        return sorted(generations.items())
+
+    def get_list_validators(self):
+        """
+        Get (etag, last_modified) of the list, without any query
+        :return:
+        """
+        return self.make_etag(*self.get_generations()), None
+
+    def get_object_validators(self, _object):
+        """
+        Get (etag, last_modified) of an object
+        :param _object:
+        :return:
+        """
+        etag = self.make_etag(_object.pk, _object.updated_at, *self.get_generations())
+        return etag, None
+
+    def conditional_response(self, validators, render):
+        """
+        Get a 304 response when the validators match the request, else render
+        the response, with the validators set on it
+        :param validators:
+        :param render:
+        :return:
+        """
+        if validators is None:
+            return render()
+        etag, last_modified = validators
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = render()
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """
+        List, or 304 when the list did not change
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        return self.conditional_response(
+            self.get_list_validators() if self.is_conditional() else None,
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve, or 304 when the object did not change
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        _object = self.get_object()
+        return self.conditional_response(
+            self.get_object_validators(_object) if self.is_conditional() else None,
+            lambda: Response(self.get_serializer(_object).data),
+        )
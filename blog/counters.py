@@ -0,0 +1,156 @@
+"""
+Blog counters
+
+Post.comment_count, Profile.post_count, Category.post_count and
+Tag.post_count are maintained with relative ``UPDATE ... SET n = n + d``
+statements from the signals and the bulk helpers, so concurrent writers
+never lose an update and no row is locked longer than its own UPDATE.
+Counter updates leave updated_at alone, they replace the generation of the
+model instead (see blog.cache), which read caches and ETags depend on.
+reconcile_counters recomputes every counter from the source tables.
+
+Category and tag counts are rendered from the taxonomy snapshot, which is
+not invalidated by counter updates (every post write would rebuild it), so
+they may lag up to TAXONOMY_SNAPSHOT_MAX_AGE seconds behind.
+"""
+
+from django.apps import apps as global_apps
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .cache import bump_generation, bump_model_generation
+from .models import Post, Profile, TAXONOMY_GENERATION
+from .utils import BULK_BATCH_SIZE
+
+
+def add_to_counter(model, field_name, deltas, using=None):
+    """
+    Add deltas to a counter column, never going below zero
+    :param model:
+    :param field_name:
+    :param deltas: mapping of pk to the amount to add
+    :param using:
+    :return:
+    """
+    by_delta = {}
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.using(using).filter(pk__in=pks).update(
+            **{field_name: Greatest(F(field_name) + delta, Value(0))}
+        )
+    if by_delta:
+        bump_model_generation(model, using=using)
+
+
+def add_comment_count(post_id, delta, using=None):
+    """
+    Count comments added to or removed from a post
+    :param post_id:
+    :param delta:
+    :param using:
+    :return:
+    """
+    add_to_counter(Post, "comment_count", {post_id: delta}, using=using)
+
+
+def add_post_count(author_id, delta, using=None):
+    """
+    Count posts added or removed by an author
+    :param author_id:
+    :param delta:
+    :param using:
+    :return:
+    """
+    add_to_counter(Profile, "post_count", {author_id: delta}, using=using)
+
+
+def add_taxonomy_counts(field_name, pairs, delta, using=None):
+    """
+    Count post and category or tag links added or removed
+    :param field_name: categories or tags
+    :param pairs: (post id, category or tag id) links
+    :param delta: 1 for added links, -1 for removed ones
+    :param using:
+    :return:
+    """
+    model = Post._meta.get_field(field_name).related_model
+    deltas = {}
+    for _, target_id in pairs:
+        deltas[target_id] = deltas.get(target_id, 0) + delta
+    add_to_counter(model, "post_count", deltas, using=using)
+
+
+def get_counters(apps=global_apps):
+    """
+    Get (model, counter field, source model, source column) of every counter
+    :param apps:
+    :return:
+    """
+    post = apps.get_model("blog", "Post")
+    return (
+        (post, "comment_count", apps.get_model("blog", "Comment"), "post_id"),
+        (apps.get_model("blog", "Profile"), "post_count", post, "author_id"),
+        (
+            apps.get_model("blog", "Category"),
+            "post_count",
+            post.categories.through,
+            "category_id",
+        ),
+        (apps.get_model("blog", "Tag"), "post_count", post.tags.through, "tag_id"),
+    )
+
+
+def reconcile_counters(apps=global_apps, batch_size=BULK_BATCH_SIZE, using="default"):
+    """
+    Recompute every counter from the source tables, batch_size rows at a
+    time, and fix the rows that drifted
+    :param apps:
+    :param batch_size:
+    :param using:
+    :return: number of rows fixed
+    """
+    fixed = 0
+    for model, field_name, source, column in get_counters(apps):
+        actual = Coalesce(
+            Subquery(
+                source.objects.using(using)
+                .filter(**{column: OuterRef("pk")})
+                .order_by()
+                .values(column)
+                .annotate(count=Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+        last_pk = 0
+        while True:
+            pks = list(
+                model.objects.using(using)
+                .filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            last_pk = pks[-1]
+            drifted = {}
+            for pk, count in (
+                model.objects.using(using)
+                .filter(pk__in=pks)
+                .annotate(actual=actual)
+                .exclude(**{field_name: F("actual")})
+                .values_list("pk", "actual")
+            ):
+                drifted.setdefault(count, []).append(pk)
+            for count, drifted_pks in drifted.items():
+                model.objects.using(using).filter(pk__in=drifted_pks).update(
+                    **{field_name: count}
+                )
+                fixed += len(drifted_pks)
+            if drifted:
+                bump_model_generation(model, using=using)
+    if fixed:
+        bump_generation(TAXONOMY_GENERATION, using=using)
+    return fixed
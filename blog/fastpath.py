@@ -0,0 +1,250 @@
+"""
+Blog list fast path
+
+List actions build their representation straight from ``values()`` rows
+instead of model instances walked by the serializer fields. The serializer
+of the request (after sparse fieldsets and expansions) is compiled once into
+a list of accessors, one per field: plain columns are copied as they are,
+dates go through the field to_representation, many-to-many fields are
+loaded with one query per field. The output is the same as the serializer's.
+Serializers with a field the fast path does not know, such as nested
+serializers of expanded posts, are rendered the regular way.
+FAST_LIST_SERIALIZATION = False turns the fast path off.
+"""
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# fields whose representation of a database value is the value itself
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.EmailField,
+    serializers.IntegerField,
+    serializers.SlugField,
+    serializers.URLField,
+)
+CONVERTED_FIELDS = (serializers.DateField, serializers.DateTimeField)
+
+
+class ValuesRepresentation:
+    """
+    Representation of a serializer compiled for values() rows
+    """
+
+    def __init__(self, model, accessors):
+        """
+        Initialize
+        :param model:
+        :param accessors: (field name, column, convert, many) tuples, many is
+            the (many-to-many field, related field) pair of related fields
+        """
+        self.model = model
+        self.accessors = accessors
+        self.columns = tuple(
+            dict.fromkeys(column for _, column, _, many in accessors if many is None)
+        )
+
+    @classmethod
+    def compile(cls, serializer, queryset=None):
+        """
+        Compile the fields of a serializer
+        :param serializer:
+        :param queryset: queryset the rows come from, for its annotations
+        :return: the representation, None when a field is not supported
+        """
+        model = serializer.Meta.model
+        annotations = set(queryset.query.annotations) if queryset is not None else ()
+        accessors = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            accessor = cls.compile_field(model, name, field, annotations)
+            if accessor is None:
+                return None
+            accessors.append(accessor)
+        return cls(model, accessors)
+
+    @staticmethod
+    def compile_field(model, name, field, annotations):
+        """
+        Compile one field
+        :param model:
+        :param name:
+        :param field:
+        :param annotations:
+        :return: accessor, None when the field is not supported
+        """
+        source = field.source
+        if source in annotations:
+            model_field = None
+        else:
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                return None
+
+        if isinstance(field, serializers.ManyRelatedField):
+            child = field.child_relation
+            if model_field is None or not model_field.many_to_many:
+                return None
+            if type(child) is serializers.PrimaryKeyRelatedField:
+                if child.pk_field is not None:
+                    return None
+                return name, source, None, (model_field, "pk")
+            if isinstance(child, serializers.SlugRelatedField):
+                return name, source, None, (model_field, child.slug_field)
+            return None
+
+        if model_field is not None and (
+            model_field.many_to_many or model_field.one_to_many
+        ):
+            return None
+        if type(field) is serializers.PrimaryKeyRelatedField:
+            if (
+                field.pk_field is not None
+                or model_field is None
+                or not model_field.many_to_one
+            ):
+                return None
+            return name, source, None, None
+        if model_field is not None and model_field.is_relation:
+            return None
+        if type(field) in PLAIN_FIELDS:
+            return name, source, None, None
+        if type(field) in CONVERTED_FIELDS:
+            return name, source, field.to_representation, None
+        return None
+
+    def get_rows(self, objects, extra_columns=()):
+        """
+        Get the values() rows of a queryset, or dicts of model instances
+        :param objects:
+        :param extra_columns: columns loaded besides the represented ones
+        :return:
+        """
+        columns = tuple(dict.fromkeys(("pk",) + self.columns + tuple(extra_columns)))
+        if isinstance(objects, QuerySet):
+            return objects.prefetch_related(None).values(*columns)
+        # values() gives the key of foreign keys, instances the related object
+        attributes = {column: column for column in columns}
+        for field in self.model._meta.concrete_fields:
+            if field.name in attributes:
+                attributes[field.name] = field.attname
+        return [
+            {
+                column: getattr(obj, attribute)
+                for column, attribute in attributes.items()
+            }
+            for obj in objects
+        ]
+
+    def get_related(self, many, rows):
+        """
+        Get the related values of the rows, with one query
+        :param many: (many-to-many field, related field) pair
+        :param rows:
+        :return: mapping of row pk to related values, in related ordering
+        """
+        field, related_field = many
+        through = field.remote_field.through
+        source = "%s_id" % field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        ordering = [
+            (
+                ("-%s__%s" % (target, order[1:]))
+                if order.startswith("-")
+                else ("%s__%s" % (target, order))
+            )
+            for order in field.related_model._meta.ordering
+        ]
+        related = {row["pk"]: [] for row in rows}
+        for pk, value in (
+            through.objects.filter(**{"%s__in" % source: list(related)})
+            .order_by(*ordering)
+            .values_list(source, "%s__%s" % (target, related_field))
+        ):
+            related[pk].append(value)
+        return related
+
+    def represent(self, rows):
+        """
+        Represent rows like the serializer with many=True
+        :param rows:
+        :return:
+        """
+        rows = list(rows)
+        related = {
+            name: self.get_related(many, rows)
+            for name, _, _, many in self.accessors
+            if many is not None
+        }
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert, many in self.accessors:
+                if many is not None:
+                    item[name] = related[name][row["pk"]]
+                    continue
+                value = row[column]
+                if value is not None and convert is not None:
+                    value = convert(value)
+                item[name] = value
+            data.append(item)
+        return data
+
+
+class FastListMixin:
+    """
+    List from values() rows when the serializer allows it
+    """
+
+    request = None
+
+    def get_values_representation(self, queryset):
+        """
+        Get the compiled representation of the serializer, None to list
+        the regular way
+        :param queryset:
+        :return:
+        """
+        if not settings.FAST_LIST_SERIALIZATION:
+            return None
+        return ValuesRepresentation.compile(self.get_serializer(), queryset)
+
+    def list_queryset(self, queryset, representation):
+        """
+        List a filtered queryset, from values() rows with the representation
+        or through the serializer when it is None
+        :param queryset:
+        :param representation:
+        :return:
+        """
+        if representation is None:
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
+            return Response(self.get_serializer(queryset, many=True).data)
+        rows = representation.get_rows(queryset, getattr(self, "required_columns", ()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(representation.represent(page))
+        return Response(representation.represent(rows))
+
+    def list(self, request, *args, **kwargs):
+        """
+        List, the queryset is filtered once whichever way it is represented
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        representation = self.get_values_representation(
+            queryset if isinstance(queryset, QuerySet) else None
+        )
+        return self.list_queryset(queryset, representation)
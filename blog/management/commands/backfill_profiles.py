@@ -0,0 +1,57 @@
+"""
+Blog command to create missing user profiles
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from blog.models import Profile
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Command to create the profile of every user that has none
+    """
+
+    help = "Create missing user profiles"
+
+    def add_arguments(self, parser):
+        """
+        Add arguments
+        :param parser:
+        :return:
+        """
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of profiles created per query",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Handle command
+        :param args:
+        :param options:
+        :return:
+        """
+        batch_size = options["batch_size"]
+        created = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(user_profile__isnull=True)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            Profile.objects.bulk_create(
+                [Profile(user_id=user_id) for user_id in user_ids],
+                ignore_conflicts=True,
+            )
+            created += len(user_ids)
+        self.stdout.write(
+            self.style.SUCCESS("Successfully created %d profiles" % created)
+        )
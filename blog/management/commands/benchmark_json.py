@@ -0,0 +1,130 @@
+"""
+Blog command to compare the JSON renderers on post pages
+"""
+
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from blog.models import Category, Post, Tag
+from blog.serializers import PostSerializer
+from blog.utils import cache_related
+from plusone import fastjson
+
+
+class Command(BaseCommand):
+    """
+    Command to time DRF's JSONRenderer and JSONParser against their orjson
+    counterparts (plusone.fastjson) on pages of serialized posts.
+
+    Posts are built in memory, no database is needed. The rendered bytes of
+    both renderers are compared first, the command fails if they differ.
+    """
+
+    help = "Benchmark the JSON and orjson renderers on post pages"
+
+    def add_arguments(self, parser):
+        """
+        Add arguments
+        :param parser:
+        :return:
+        """
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=100,
+            help="Number of posts per page",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=200,
+            help="Number of times each page is rendered and parsed",
+        )
+
+    @staticmethod
+    def build_page(page_size):
+        """
+        Serialize a page of in-memory posts
+        :param page_size:
+        :return:
+        """
+        now = timezone.now()
+        categories = [Category(id=i, name="Category %d" % i) for i in range(1, 4)]
+        tags = [Tag(id=i, name="Tag %d" % i) for i in range(1, 6)]
+        for _object in categories + tags:
+            _object.slug = _object.name.lower().replace(" ", "-")
+        posts = []
+        for i in range(1, page_size + 1):
+            _post = Post(
+                id=i,
+                title="Post %d, café" % i,
+                content="Lorem ipsum dolor sit amet, ünïcödé “quotes” \u2028 " * 20,
+                author_id=i % 10 + 1,
+                comment_count=i % 7,
+                created_at=now,
+                updated_at=now,
+            )
+            cache_related(_post, "categories", categories[: i % 4])
+            cache_related(_post, "tags", tags[: i % 6])
+            posts.append(_post)
+        return {
+            "count": page_size * 10,
+            "next": "http://testserver/api/posts/?cursor=cD0yMDI0",
+            "previous": None,
+            "results": PostSerializer(posts, many=True).data,
+        }
+
+    @staticmethod
+    def time_per_call(func, rounds):
+        """
+        Get the mean milliseconds of a call to func
+        :param func:
+        :param rounds:
+        :return:
+        """
+        started = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        return (time.perf_counter() - started) * 1000 / rounds
+
+    def handle(self, *args, **options):
+        """
+        Handle command
+        :param args:
+        :param options:
+        :return:
+        """
+        page = self.build_page(options["page_size"])
+        rounds = options["rounds"]
+
+        renderers = (JSONRenderer(), fastjson.ORJSONRenderer())
+        parsers = (JSONParser(), fastjson.ORJSONParser())
+        content = [renderer.render(page) for renderer in renderers]
+        if content[0] != content[1]:
+            raise CommandError("Rendered pages differ")
+        self.stdout.write(
+            "%d posts per page, %d bytes, %d rounds"
+            % (options["page_size"], len(content[0]), rounds)
+        )
+
+        for action, (default, fast) in (
+            (
+                "render",
+                [lambda r=r: r.render(page) for r in renderers],
+            ),
+            (
+                "parse",
+                [lambda p=p: p.parse(io.BytesIO(content[0])) for p in parsers],
+            ),
+        ):
+            default_ms = self.time_per_call(default, rounds)
+            fast_ms = self.time_per_call(fast, rounds)
+            self.stdout.write(
+                "%s: json %.3f ms, orjson %.3f ms, %.1fx"
+                % (action, default_ms, fast_ms, default_ms / max(fast_ms, 1e-9))
+            )
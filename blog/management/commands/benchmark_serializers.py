@@ -0,0 +1,149 @@
+"""
+Blog command to compare list serialization with the values() fast path
+"""
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Prefetch
+
+from blog.fastpath import ValuesRepresentation
+from blog.models import Category, Comment, Post, Profile, Tag
+from blog.serializers import CommentSerializer, PostSerializer
+from blog.utils import bulk_set_related
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Command to measure the throughput of the post and comment list
+    serializers against their values() fast path (blog.fastpath).
+
+    Rows are inserted in a transaction rolled back at the end, so the
+    database is left as it was. Both representations are compared first,
+    the command fails if they differ. Timings include the queries.
+    """
+
+    help = "Benchmark list serializers against the values() fast path"
+
+    def add_arguments(self, parser):
+        """
+        Add arguments
+        :param parser:
+        :return:
+        """
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=1000,
+            help="Number of posts and comments serialized per round",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=10,
+            help="Number of times the rows are serialized",
+        )
+
+    @staticmethod
+    def create_rows(rows):
+        """
+        Insert posts, with categories and tags, and comments
+        :param rows:
+        :return:
+        """
+        _user = User.objects.create_user(
+            email="benchmark@benchmark.local", username="benchmark_serializers"
+        )
+        _profile, _ = Profile.objects.get_or_create(user=_user)
+        posts = Post.objects.bulk_create(
+            [
+                Post(title="Post %d" % i, content="Lorem ipsum " * 50, author=_profile)
+                for i in range(rows)
+            ]
+        )
+        categories = list(Category.objects.all()[:3])
+        tags = list(Tag.objects.all()[:5])
+        bulk_set_related(
+            Post,
+            "categories",
+            {_post.pk: categories[: i % 4] for i, _post in enumerate(posts)},
+        )
+        bulk_set_related(
+            Post, "tags", {_post.pk: tags[: i % 6] for i, _post in enumerate(posts)}
+        )
+        Comment.objects.bulk_create(
+            [Comment(post=_post, author=_profile, content="Comment") for _post in posts]
+        )
+
+    @staticmethod
+    def time_rounds(func, rounds):
+        """
+        Get the result of func and the mean seconds of a call
+        :param func:
+        :param rounds:
+        :return:
+        """
+        started = time.perf_counter()
+        for _ in range(rounds):
+            result = func()
+        return result, (time.perf_counter() - started) / rounds
+
+    def compare(self, serializer_class, queryset, rows, rounds):
+        """
+        Time a serializer and its fast path on the same rows
+        :param serializer_class:
+        :param queryset:
+        :param rows:
+        :param rounds:
+        :return:
+        """
+        representation = ValuesRepresentation.compile(serializer_class())
+        if representation is None:
+            raise CommandError("%s has no fast path" % serializer_class.__name__)
+        expected, default = self.time_rounds(
+            lambda: serializer_class(queryset.all(), many=True).data, rounds
+        )
+        data, fast = self.time_rounds(
+            lambda: representation.represent(representation.get_rows(queryset.all())),
+            rounds,
+        )
+        if [dict(item) for item in expected] != data:
+            raise CommandError("%s representations differ" % serializer_class.__name__)
+        self.stdout.write(
+            "%s: serializer %.0f rows/s, values %.0f rows/s, %.1fx"
+            % (serializer_class.__name__, rows / default, rows / fast, default / fast)
+        )
+
+    def handle(self, *args, **options):
+        """
+        Handle command
+        :param args:
+        :param options:
+        :return:
+        """
+        rows = options["rows"]
+        rounds = options["rounds"]
+        cases = (
+            (
+                PostSerializer,
+                Post.objects.prefetch_related(
+                    Prefetch("categories", Category.objects.only("id", "slug")),
+                    Prefetch("tags", Tag.objects.only("id", "slug")),
+                ),
+            ),
+            (CommentSerializer, Comment.objects.all()),
+        )
+        with transaction.atomic():
+            self.create_rows(rows)
+            for serializer_class, queryset in cases:
+                self.compare(
+                    serializer_class,
+                    queryset.order_by("-created_at", "-id")[:rows],
+                    rows,
+                    rounds,
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,38 @@
+"""
+Blog command to recompute the denormalized counters
+"""
+
+from django.core.management.base import BaseCommand
+
+from blog.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    """
+    Command to recompute comment and post counters from the source tables
+    """
+
+    help = "Recompute comment and post counters"
+
+    def add_arguments(self, parser):
+        """
+        Add arguments
+        :param parser:
+        :return:
+        """
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows checked per query",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Handle command
+        :param args:
+        :param options:
+        :return:
+        """
+        fixed = reconcile_counters(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS("Successfully fixed %d counters" % fixed))
@@ -0,0 +1,70 @@
+from django.db import migrations
+from django.db.utils import DatabaseError
+
+SEARCH_CONFIG = "english"
+FTS_TABLE = "blog_post_fts"
+
+
+class Migration(migrations.Migration):
+    """
+    Migration class
+    """
+
+    dependencies = [
+        ("blog", "0004_post_comment_created_id_index"),
+    ]
+
+    def create_index(apps, schema_editor):
+        """
+        Create post full-text search index
+        :param schema_editor:
+        :return:
+        """
+        table = apps.get_model("blog", "Post")._meta.db_table
+        connection = schema_editor.connection
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    f"ALTER TABLE {table} ADD COLUMN search_vector tsvector "
+                    f"GENERATED ALWAYS AS ("
+                    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+                    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')"
+                    f") STORED"
+                )
+                cursor.execute(
+                    f"CREATE INDEX {table}_search_vector_idx ON {table} "
+                    f"USING gin (search_vector)"
+                )
+            elif connection.vendor == "sqlite":
+                try:
+                    cursor.execute(
+                        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title, content)"
+                    )
+                except DatabaseError:
+                    # SQLite built without FTS5, keep the ILIKE search
+                    return
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE}(rowid, title, content) "
+                    f"SELECT id, title, content FROM {table}"
+                )
+
+    def drop_index(apps, schema_editor):
+        """
+        Drop post full-text search index
+        :param schema_editor:
+        :return:
+        """
+        table = apps.get_model("blog", "Post")._meta.db_table
+        connection = schema_editor.connection
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(f"DROP INDEX IF EXISTS {table}_search_vector_idx")
+                cursor.execute(
+                    f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector"
+                )
+            elif connection.vendor == "sqlite":
+                cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
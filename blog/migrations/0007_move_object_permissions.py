@@ -0,0 +1,115 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+# direct permission model per (model, generic model, user or group field)
+DIRECT_MODELS = (
+    ("Post", "UserObjectPermission", "PostUserObjectPermission", "user"),
+    ("Post", "GroupObjectPermission", "PostGroupObjectPermission", "group"),
+    ("Comment", "UserObjectPermission", "CommentUserObjectPermission", "user"),
+    ("Comment", "GroupObjectPermission", "CommentGroupObjectPermission", "group"),
+    ("Profile", "UserObjectPermission", "ProfileUserObjectPermission", "user"),
+    ("Profile", "GroupObjectPermission", "ProfileGroupObjectPermission", "group"),
+)
+
+
+def copy_batch(model, direct, field, rows):
+    """
+    Insert generic permission rows into a direct table, skipping rows of
+    objects that do not exist anymore
+    :param model:
+    :param direct:
+    :param field:
+    :param rows: (permission_id, user or group id, object_pk) tuples
+    :return:
+    """
+    object_ids = {int(object_pk) for _, _, object_pk in rows if object_pk.isdigit()}
+    existing = set(model.objects.filter(id__in=object_ids).values_list("id", flat=True))
+    direct.objects.bulk_create(
+        [
+            direct(
+                permission_id=permission_id,
+                content_object_id=int(object_pk),
+                **{"%s_id" % field: owner_id},
+            )
+            for permission_id, owner_id, object_pk in rows
+            if object_pk.isdigit() and int(object_pk) in existing
+        ],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    Migration class
+    """
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("guardian", "0002_generic_permissions_index"),
+        ("blog", "0006_direct_object_permissions"),
+    ]
+
+    def move_to_direct(apps, schema_editor):
+        """
+        Move blog rows of the generic object permission tables to the
+        direct foreign key tables, rows of deleted objects are dropped
+        :param schema_editor:
+        :return:
+        """
+        ContentType = apps.get_model("contenttypes", "ContentType")
+        for model_name, generic_name, direct_name, field in DIRECT_MODELS:
+            model = apps.get_model("blog", model_name)
+            generic = apps.get_model("guardian", generic_name)
+            direct = apps.get_model("blog", direct_name)
+            content_type = ContentType.objects.filter(
+                app_label="blog", model=model_name.lower()
+            ).first()
+            if content_type is None:
+                continue
+            rows = generic.objects.filter(content_type=content_type)
+            pending = []
+            for row in rows.values_list(
+                "permission_id", "%s_id" % field, "object_pk"
+            ).iterator(chunk_size=BATCH_SIZE):
+                pending.append(row)
+                if len(pending) >= BATCH_SIZE:
+                    copy_batch(model, direct, field, pending)
+                    pending = []
+            copy_batch(model, direct, field, pending)
+            rows.delete()
+
+    def move_to_generic(apps, schema_editor):
+        """
+        Move the direct foreign key rows back to the generic tables
+        :param schema_editor:
+        :return:
+        """
+        ContentType = apps.get_model("contenttypes", "ContentType")
+        for model_name, generic_name, direct_name, field in DIRECT_MODELS:
+            generic = apps.get_model("guardian", generic_name)
+            direct = apps.get_model("blog", direct_name)
+            content_type, _ = ContentType.objects.get_or_create(
+                app_label="blog", model=model_name.lower()
+            )
+            batch = []
+            for permission_id, owner_id, object_id in direct.objects.values_list(
+                "permission_id", "%s_id" % field, "content_object_id"
+            ).iterator():
+                batch.append(
+                    generic(
+                        permission_id=permission_id,
+                        content_type=content_type,
+                        object_pk=str(object_id),
+                        **{"%s_id" % field: owner_id},
+                    )
+                )
+                if len(batch) >= BATCH_SIZE:
+                    generic.objects.bulk_create(batch, ignore_conflicts=True)
+                    batch = []
+            generic.objects.bulk_create(batch, ignore_conflicts=True)
+            direct.objects.all().delete()
+
+    operations = [
+        migrations.RunPython(move_to_direct, move_to_generic),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0007_move_object_permissions"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["post", "-created_at", "-id"],
+                name="blog_comment_post_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:21
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+class Migration(migrations.Migration):
+    """
+    Migration class
+    """
+
+    dependencies = [
+        ("blog", "0008_comment_post_created_index"),
+    ]
+
+    def fill_counters(apps, schema_editor):
+        """
+        Compute the counters of existing rows
+        :param schema_editor:
+        :return:
+        """
+        using = schema_editor.connection.alias
+        post = apps.get_model("blog", "Post")
+        for model, source, column in (
+            (post, apps.get_model("blog", "Comment"), "post_id"),
+            (apps.get_model("blog", "Profile"), post, "author_id"),
+            (
+                apps.get_model("blog", "Category"),
+                post.categories.through,
+                "category_id",
+            ),
+            (apps.get_model("blog", "Tag"), post.tags.through, "tag_id"),
+        ):
+            field_name = "comment_count" if model is post else "post_count"
+            model.objects.using(using).update(
+                **{
+                    field_name: Coalesce(
+                        Subquery(
+                            source.objects.using(using)
+                            .filter(**{column: OuterRef("pk")})
+                            .order_by()
+                            .values(column)
+                            .annotate(count=Count("pk"))
+                            .values("count")
+                        ),
+                        0,
+                    )
+                }
+            )
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="post_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, help_text="number of posts"
+            ),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="comment_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, help_text="number of comments"
+            ),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="post_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, help_text="number of posts"
+            ),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="post_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, help_text="number of posts"
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
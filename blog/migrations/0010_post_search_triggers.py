@@ -0,0 +1,67 @@
+from django.db import migrations
+
+FTS_TABLE = "blog_post_fts"
+
+
+class Migration(migrations.Migration):
+    """
+    Migration class
+    """
+
+    dependencies = [
+        ("blog", "0009_counters"),
+    ]
+
+    def create_triggers(apps, schema_editor):
+        """
+        Keep the SQLite full-text shadow table in sync with the post table
+        from triggers, which queryset updates, bulk writes and raw SQL fire
+        as well as saves, and refresh the rows indexed so far
+        :param schema_editor:
+        :return:
+        """
+        table = apps.get_model("blog", "Post")._meta.db_table
+        connection = schema_editor.connection
+        if connection.vendor != "sqlite":
+            return
+        with connection.cursor() as cursor:
+            if FTS_TABLE not in connection.introspection.table_names(cursor):
+                return
+            cursor.execute(
+                f"CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {FTS_TABLE}(rowid, title, content) "
+                f"VALUES (new.id, new.title, new.content); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER {FTS_TABLE}_update "
+                f"AFTER UPDATE OF id, title, content ON {table} BEGIN "
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; "
+                f"INSERT INTO {FTS_TABLE}(rowid, title, content) "
+                f"VALUES (new.id, new.title, new.content); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON {table} BEGIN "
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END"
+            )
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}(rowid, title, content) "
+                f"SELECT id, title, content FROM {table}"
+            )
+
+    def drop_triggers(apps, schema_editor):
+        """
+        Drop the full-text shadow table triggers
+        :param schema_editor:
+        :return:
+        """
+        connection = schema_editor.connection
+        if connection.vendor != "sqlite":
+            return
+        with connection.cursor() as cursor:
+            for action in ("insert", "update", "delete"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{action}")
+
+    operations = [
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
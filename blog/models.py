@@ -6,9 +6,14 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
+from guardian.models import GroupObjectPermissionBase, UserObjectPermissionBase
+
+from .cache import bump_generation
 
 User = get_user_model()
 
+TAXONOMY_GENERATION = "taxonomy"
+
 
 class TimeStamp(models.Model):
     """
@@ -63,6 +68,7 @@ class Slug(models.Model):
         """
         self.slug = slugify(self.name)
         super().save(*args, **kwargs)
+        bump_generation(TAXONOMY_GENERATION, using=kwargs.get("using"))
 
 
 class Profile(TimeStamp):
@@ -73,6 +79,7 @@ class Profile(TimeStamp):
         user (models.OneToOneField): One-to-one relationship with the User model.
         bio (models.TextField): Text field for the user's biography.
         profile_picture (models.ImageField): Image field for the user's profile picture.
+        post_count (models.PositiveIntegerField): Number of posts of the user.
     """
 
     user = models.OneToOneField(
@@ -83,6 +90,9 @@ class Profile(TimeStamp):
     )
     bio = models.TextField()
     profile_picture = models.ImageField(upload_to="profile_pictures")
+    post_count = models.PositiveIntegerField(
+        default=0, editable=False, help_text=_("number of posts")
+    )
 
     def __str__(self):
         """
@@ -99,8 +109,15 @@ class Category(TimeStamp, Slug):
     Inherits from:
         - TimeStamp
         - Slug
+
+    Fields:
+        post_count (models.PositiveIntegerField): Number of posts of the category.
     """
 
+    post_count = models.PositiveIntegerField(
+        default=0, editable=False, help_text=_("number of posts")
+    )
+
     class Meta:
         """
         Meta class for category model
@@ -123,8 +140,15 @@ class Tag(TimeStamp, Slug):
     Inherits from:
         - TimeStamp
         - Slug
+
+    Fields:
+        post_count (models.PositiveIntegerField): Number of posts of the tag.
     """
 
+    post_count = models.PositiveIntegerField(
+        default=0, editable=False, help_text=_("number of posts")
+    )
+
     class Meta:
         """
         Meta class for tag model
@@ -150,6 +174,7 @@ class Post(TimeStamp):
         author (models.ForeignKey): Foreign key relationship with the Profile model.
         categories (models.ManyToManyField): Many-to-many relationship with the Category model.
         tags (models.ManyToManyField): Many-to-many relationship with the Tag model.
+        comment_count (models.PositiveIntegerField): Number of comments of the post.
     """
 
     title = models.CharField(max_length=255)
@@ -170,6 +195,9 @@ class Post(TimeStamp):
         related_name="tag_posts",
         help_text=_("tag object"),
     )
+    comment_count = models.PositiveIntegerField(
+        default=0, editable=False, help_text=_("number of comments")
+    )
 
     class Meta:
         """
@@ -177,6 +205,11 @@ class Post(TimeStamp):
         """
 
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"], name="blog_post_created_id_idx"
+            ),
+        ]
 
     def __str__(self):
         """
@@ -215,6 +248,15 @@ class Comment(TimeStamp):
         """
 
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"], name="blog_comment_created_id_idx"
+            ),
+            models.Index(
+                fields=["post", "-created_at", "-id"],
+                name="blog_comment_post_created_idx",
+            ),
+        ]
 
     def __str__(self):
         """
@@ -222,3 +264,69 @@ class Comment(TimeStamp):
         :return:
         """
         return self.content
+
+
+class PostUserObjectPermission(UserObjectPermissionBase):
+    """
+    Post user object permission
+
+    Direct foreign key replacement of guardian's generic user object
+    permission for posts.
+    """
+
+    content_object = models.ForeignKey(Post, on_delete=models.CASCADE)
+
+
+class PostGroupObjectPermission(GroupObjectPermissionBase):
+    """
+    Post group object permission
+
+    Direct foreign key replacement of guardian's generic group object
+    permission for posts.
+    """
+
+    content_object = models.ForeignKey(Post, on_delete=models.CASCADE)
+
+
+class CommentUserObjectPermission(UserObjectPermissionBase):
+    """
+    Comment user object permission
+
+    Direct foreign key replacement of guardian's generic user object
+    permission for comments.
+    """
+
+    content_object = models.ForeignKey(Comment, on_delete=models.CASCADE)
+
+
+class CommentGroupObjectPermission(GroupObjectPermissionBase):
+    """
+    Comment group object permission
+
+    Direct foreign key replacement of guardian's generic group object
+    permission for comments.
+    """
+
+    content_object = models.ForeignKey(Comment, on_delete=models.CASCADE)
+
+
+class ProfileUserObjectPermission(UserObjectPermissionBase):
+    """
+    Profile user object permission
+
+    Direct foreign key replacement of guardian's generic user object
+    permission for profiles.
+    """
+
+    content_object = models.ForeignKey(Profile, on_delete=models.CASCADE)
+
+
+class ProfileGroupObjectPermission(GroupObjectPermissionBase):
+    """
+    Profile group object permission
+
+    Direct foreign key replacement of guardian's generic group object
+    permission for profiles.
+    """
+
+    content_object = models.ForeignKey(Profile, on_delete=models.CASCADE)
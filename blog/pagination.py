@@ -0,0 +1,378 @@
+"""
+Blog pagination
+"""
+
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination on (created_at, id), newest first.
+
+    The cursor is an opaque token holding the position of the last row of
+    the previous page, so every page is a single index range scan instead
+    of an OFFSET scan, and no COUNT query is issued. Querysets ordered
+    otherwise, by the ordering or search query params, are answered 400.
+    paginate_queryset_lazily returns the page as a queryset instead of a
+    list, for views streaming large pages.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    invalid_ordering_message = "Cursor pages are ordered newest first only"
+    ordering = ("-created_at", "-id")
+    page_size = PageNumberPagination.page_size
+
+    def __init__(self):
+        """
+        Initialize
+        """
+        self.base_url = None
+        self.has_next = False
+        self.has_previous = False
+        self.page = []
+        self.bounds = None
+
+    def get_page_size(self, request):
+        """
+        Get page size
+        :param request:
+        :return:
+        """
+        return self.page_size
+
+    def decode_cursor(self, request):
+        """
+        Decode cursor query param into (reverse, created_at, id)
+        :param request:
+        :return:
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            querystring = b64decode(encoded.encode("ascii")).decode("ascii")
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            reverse = bool(int(tokens.get("r", ["0"])[0]))
+            created_at = parse_datetime(tokens["t"][0])
+            _id = int(tokens["i"][0])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, created_at, _id
+
+    @staticmethod
+    def encode_cursor(reverse, created_at, _id):
+        """
+        Encode a position into an opaque cursor
+        :param reverse:
+        :param created_at:
+        :param _id:
+        :return:
+        """
+        querystring = parse.urlencode(
+            {"r": int(reverse), "t": created_at.isoformat(), "i": _id}
+        )
+        return b64encode(querystring.encode("ascii")).decode("ascii")
+
+    @staticmethod
+    def get_position(item):
+        """
+        Get (created_at, id) of a row, model instance or values() dict
+        :param item:
+        :return:
+        """
+        if isinstance(item, dict):
+            return item["created_at"], item["id"]
+        return item.created_at, item.pk
+
+    def check_ordering(self, queryset):
+        """
+        Reject a queryset ordered otherwise than newest first, its rows would
+        be paginated in another order than the requested one
+        :param queryset:
+        :return:
+        """
+        ordering = tuple(queryset.query.order_by)
+        if ordering != self.ordering[: len(ordering)]:
+            raise ValidationError(
+                {self.cursor_query_param: [self.invalid_ordering_message]}
+            )
+
+    def filter_from_cursor(self, queryset, cursor):
+        """
+        Get the rows past the cursor in fetch order, oldest first when going
+        back to a previous page
+        :param queryset:
+        :param cursor:
+        :return: (queryset, reverse)
+        """
+        self.check_ordering(queryset)
+        if cursor is None:
+            return queryset.order_by(*self.ordering), False
+        reverse, created_at, _id = cursor
+        if reverse:
+            return (
+                queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=_id)
+                ).order_by("created_at", "id"),
+                True,
+            )
+        return (
+            queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=_id)
+            ).order_by(*self.ordering),
+            False,
+        )
+
+    def set_bounds(self, cursor, reverse, has_more, bounds):
+        """
+        Set the positions of the first and last rows of the page, and which
+        links the page has
+        :param cursor:
+        :param reverse:
+        :param has_more: whether rows follow the page in fetch order
+        :param bounds: (first, last) positions, None for an empty page
+        :return:
+        """
+        self.bounds = bounds
+        if reverse:
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Paginate queryset
+        :param queryset:
+        :param request:
+        :param view:
+        :return:
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        queryset, reverse = self.filter_from_cursor(queryset, cursor)
+
+        results = list(queryset[: page_size + 1])
+        self.page = results[:page_size]
+        if reverse:
+            self.page.reverse()
+        self.set_bounds(
+            cursor,
+            reverse,
+            len(results) > page_size,
+            (
+                (self.get_position(self.page[0]), self.get_position(self.page[-1]))
+                if self.page
+                else None
+            ),
+        )
+        return self.page
+
+    def paginate_queryset_lazily(self, queryset, request, view=None):
+        """
+        Paginate queryset without loading the page, the bounds of the page
+        are read with (created_at, id) queries of a row or two and the page
+        is the rows between them
+        :param queryset:
+        :param request:
+        :param view:
+        :return: queryset of the page
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        queryset, reverse = self.filter_from_cursor(queryset, cursor)
+
+        positions = queryset.values_list("created_at", "id")
+        first = positions.first()
+        if first is None:
+            self.set_bounds(cursor, reverse, False, None)
+            return queryset.none()
+        edge = list(positions[page_size - 1 : page_size + 1])
+        last = edge[0] if edge else positions.reverse().first()
+        # shown newest first, so first and last swap when fetched oldest first
+        bounds = (last, first) if reverse else (first, last)
+        self.set_bounds(cursor, reverse, len(edge) > 1, bounds)
+        # rows are read later, rows written meanwhile must not shift the
+        # page away from the bounds the links were built from
+        newest, oldest = bounds
+        return queryset.filter(
+            Q(created_at__lt=newest[0]) | Q(created_at=newest[0], id__lte=newest[1]),
+            Q(created_at__gt=oldest[0]) | Q(created_at=oldest[0], id__gte=oldest[1]),
+        ).order_by(*self.ordering)
+
+    def get_next_link(self):
+        """
+        Get next link
+        :return:
+        """
+        if not self.has_next or self.bounds is None:
+            return None
+        created_at, _id = self.bounds[1]
+        cursor = self.encode_cursor(False, created_at, _id)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        """
+        Get previous link
+        :return:
+        """
+        if not self.has_previous:
+            return None
+        if self.bounds is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        created_at, _id = self.bounds[0]
+        cursor = self.encode_cursor(True, created_at, _id)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        """
+        Get paginated response
+        :param data:
+        :return:
+        """
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        """
+        Get paginated response schema
+        :param schema:
+        :return:
+        """
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        """
+        Get schema operation parameters
+        :param view:
+        :return:
+        """
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            }
+        ]
+
+
+class CreatedAtPagination(PageNumberPagination):
+    """
+    Page number pagination with an opt-in keyset mode.
+
+    Requests carrying the cursor query param (an empty value starts at the
+    first page) are paginated with KeysetPagination, the others keep the
+    regular page number behaviour. Clients choose the page size with the
+    page_size query param, up to MAX_PAGE_SIZE.
+    """
+
+    keyset_class = KeysetPagination
+    page_size_query_param = "page_size"
+    max_page_size = settings.MAX_PAGE_SIZE
+
+    def __init__(self):
+        """
+        Initialize
+        """
+        self.keyset = None
+
+    def use_keyset(self, request):
+        """
+        Whether the request is paginated with keyset pagination, whose
+        paginator is set up then
+        :param request:
+        :return:
+        """
+        if self.keyset_class.cursor_query_param not in request.query_params:
+            return False
+        self.keyset = self.keyset_class()
+        self.keyset.page_size = self.get_page_size(request)
+        return True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Paginate queryset
+        :param queryset:
+        :param request:
+        :param view:
+        :return:
+        """
+        if self.use_keyset(request):
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_queryset_lazily(self, queryset, request, view=None):
+        """
+        Paginate queryset without loading the page
+        :param queryset:
+        :param request:
+        :param view:
+        :return: queryset of the page
+        """
+        if self.use_keyset(request):
+            return self.keyset.paginate_queryset_lazily(queryset, request, view)
+        self.request = request
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        return self.page.object_list
+
+    def get_paginated_response(self, data):
+        """
+        Get paginated response
+        :param data:
+        :return:
+        """
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        """
+        Get schema operation parameters
+        :param view:
+        :return:
+        """
+        return super().get_schema_operation_parameters(
+            view
+        ) + self.keyset_class().get_schema_operation_parameters(view)
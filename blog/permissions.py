@@ -0,0 +1,224 @@
+"""
+Blog permissions
+
+Resolves the permissions granted by ModelBackend (user and group model
+permissions) and guardian's ObjectPermissionBackend (user and group object
+permissions) with as few queries as possible. Model permissions of a user
+are cached across requests, object permissions are memoized per request.
+"""
+
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404
+from guardian.utils import get_group_obj_perms_model, get_user_obj_perms_model
+from rest_framework.permissions import SAFE_METHODS, DjangoObjectPermissions
+
+from .cache import bump_generation, get_generation
+
+PERMISSION_GENERATION = "permissions"
+
+
+def get_model_permissions_key(user_id):
+    """
+    Get cache key of the model permissions of a user
+    :param user_id:
+    :return:
+    """
+    return "blog:perms:%s:%s" % (get_generation(PERMISSION_GENERATION), user_id)
+
+
+def get_model_permissions(user):
+    """
+    Get "app_label.codename" model permissions of a user, granted directly
+    or through a group, from the cache or with one query
+    :param user:
+    :return:
+    """
+    key = get_model_permissions_key(user.pk)
+    permissions = cache.get(key)
+    if permissions is None:
+        permissions = frozenset(
+            "%s.%s" % (app_label, codename)
+            for app_label, codename in Permission.objects.filter(
+                Q(user=user) | Q(group__user=user)
+            )
+            .values_list("content_type__app_label", "codename")
+            .distinct()
+        )
+        cache.set(key, permissions, settings.PERMISSION_CACHE_TTL)
+    return permissions
+
+
+def invalidate_model_permissions(user_id=None, using=None):
+    """
+    Invalidate cached model permissions of one user, or of every user, now
+    and once the current transaction commits, so permissions read by a
+    concurrent request before the commit are not cached again
+    :param user_id:
+    :param using:
+    :return:
+    """
+    if user_id is None:
+        bump_generation(PERMISSION_GENERATION, using=using)
+        return
+
+    def delete():
+        cache.delete(get_model_permissions_key(user_id))
+
+    delete()
+    transaction.on_commit(delete, using=using)
+
+
+class PermissionResolver:
+    """
+    Permissions of one user during one request
+    """
+
+    def __init__(self, user):
+        """
+        Initialize
+        :param user:
+        """
+        self.user = user
+        self.model_permissions = None
+        self.object_permissions = {}
+
+    def has_perms(self, perms, obj=None):
+        """
+        Same answer as user.has_perms(perms, obj) with ModelBackend and
+        guardian's ObjectPermissionBackend
+        :param perms:
+        :param obj:
+        :return:
+        """
+        if not self.user.is_active:
+            return False
+        if self.user.is_superuser:
+            return True
+        if not perms:
+            return True
+        if obj is None:
+            if self.model_permissions is None:
+                self.model_permissions = get_model_permissions(self.user)
+            return set(perms) <= self.model_permissions
+        if obj.pk is None:
+            # no object permission can be granted on an unsaved object
+            return False
+        self.prefetch([obj])
+        codenames = self.object_permissions[(obj.__class__, obj.pk)]
+        return all(
+            "." in perm
+            and perm.split(".", 1)[0] == obj._meta.app_label
+            and perm.split(".", 1)[1] in codenames
+            for perm in perms
+        )
+
+    def prefetch(self, objects):
+        """
+        Load object permissions of objects of one model, in one query
+        :param objects:
+        :return:
+        """
+        objects = [obj for obj in objects if obj.pk is not None]
+        missing = {
+            obj.pk
+            for obj in objects
+            if (obj.__class__, obj.pk) not in self.object_permissions
+        }
+        if not missing or not self.user.is_authenticated:
+            for pk in missing:
+                self.object_permissions[(objects[0].__class__, pk)] = frozenset()
+            return
+        model = objects[0].__class__
+        user_model = get_user_obj_perms_model(model)
+        group_model = get_group_obj_perms_model(model)
+
+        if user_model.objects.is_generic():
+            content_type = ContentType.objects.get_for_model(model)
+            lookups = {
+                "content_type": content_type,
+                "object_pk__in": [str(pk) for pk in missing],
+            }
+            columns = ("object_pk", "permission__codename")
+        else:
+            lookups = {"content_object_id__in": missing}
+            columns = ("content_object_id", "permission__codename")
+        user_rows = user_model.objects.filter(user=self.user, **lookups).values_list(
+            *columns
+        )
+        group_rows = group_model.objects.filter(
+            group__user=self.user, **lookups
+        ).values_list(*columns)
+
+        granted = {pk: set() for pk in missing}
+        pk_field = model._meta.pk
+        for object_pk, codename in user_rows.union(group_rows):
+            granted[pk_field.to_python(object_pk)].add(codename)
+        for pk, codenames in granted.items():
+            self.object_permissions[(model, pk)] = frozenset(codenames)
+
+
+def get_permission_resolver(request):
+    """
+    Get the permission resolver of a request
+    :param request:
+    :return:
+    """
+    resolver = getattr(request, "_permission_resolver", None)
+    if resolver is None or resolver.user is not request.user:
+        resolver = PermissionResolver(request.user)
+        request._permission_resolver = resolver
+    return resolver
+
+
+class CachedDjangoObjectPermissions(DjangoObjectPermissions):
+    """
+    DjangoObjectPermissions checked through the request permission resolver
+    """
+
+    def has_permission(self, request, view):
+        """
+        Has permission
+        :param request:
+        :param view:
+        :return:
+        """
+        if not request.user or (
+            not request.user.is_authenticated and self.authenticated_users_only
+        ):
+            return False
+
+        if getattr(view, "_ignore_model_permissions", False):
+            return True
+
+        queryset = self._queryset(view)
+        perms = self.get_required_permissions(request.method, queryset.model)
+        return get_permission_resolver(request).has_perms(perms)
+
+    def has_object_permission(self, request, view, obj):
+        """
+        Has object permission
+        :param request:
+        :param view:
+        :param obj:
+        :return:
+        """
+        model_cls = self._queryset(view).model
+        resolver = get_permission_resolver(request)
+
+        perms = self.get_required_object_permissions(request.method, model_cls)
+        if not resolver.has_perms(perms, obj):
+            if request.method in SAFE_METHODS:
+                raise Http404
+
+            read_perms = self.get_required_object_permissions("GET", model_cls)
+            if not resolver.has_perms(read_perms, obj):
+                raise Http404
+
+            return False
+
+        return True
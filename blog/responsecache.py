@@ -0,0 +1,277 @@
+"""
+Blog response cache
+
+Rendered JSON responses of the read endpoints are kept in the default cache
+under a key made of the path, the query params, the negotiated media type
+and the permission scope of the user, along with the generation of every
+model the view renders (see blog.cache). Any save or delete of one of those
+models bumps its generation, so the entry no longer matches and the next
+request renders again: invalidation costs one cache write whatever the
+number of cached responses. Hits skip the database entirely, including the
+conditional request validators, whose headers are cached along with the
+content.
+
+Renders are single-flight: a request that misses takes a lock on the key
+(for RESPONSE_CACHE_LOCK_TIMEOUT seconds at most) before rendering. While
+the lock is held, other requests are served the previous entry when there
+is one (stale-while-revalidate), or else wait up to RESPONSE_CACHE_LOCK_WAIT
+seconds for the entry to be stored and render themselves past that. The
+lock is an add to the default cache: it holds across workers when that
+cache is shared (see SHARED_CACHE), only within one process otherwise.
+Waiting polls the cache and blocks the worker thread meanwhile, hence the
+short wait. The response_cache.hit, .miss, .stale, .lock.wait and
+.lock.timeout metrics count lookups and lock waits.
+
+Category and tag responses are rendered from the taxonomy snapshot, so their
+post counts keep the lag described in blog.counters.
+"""
+
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from plusone import metrics
+
+from .cache import get_generations, get_model_generation_name
+from .permissions import get_permission_resolver
+
+RESPONSE_KEY_PREFIX = "blog:response:"
+CACHED_HEADERS = ("ETag", "Last-Modified")
+LOCK_POLL_INTERVAL = 0.05
+
+
+class ResponseCacheMixin:
+    """
+    Serve list and retrieve responses from the cache.
+
+    Views list in ``cache_models`` every model their representation is
+    built from.
+    """
+
+    request = None
+    cache_models = ()
+
+    def is_cacheable(self):
+        """
+        Whether the response of this request may be cached, only JSON
+        renders as the browsable API shows the user
+        :return:
+        """
+        request = self.request
+        return bool(
+            settings.RESPONSE_CACHE_TTL
+            and request.method in ("GET", "HEAD")
+            and getattr(request, "accepted_renderer", None) is not None
+            and request.accepted_renderer.format == "json"
+        )
+
+    def get_cache_scope(self):
+        """
+        Get what, besides the request, the representation depends on for this
+        user: the permissions required to read the view that the user holds,
+        already resolved by the permission check, and the user itself when
+        reading objects requires object permissions
+        :return:
+        """
+        request = self.request
+        model = self.queryset.model
+        resolver = get_permission_resolver(request)
+        required = set()
+        per_user = False
+        for permission in self.get_permissions():
+            if hasattr(permission, "get_required_permissions"):
+                required.update(
+                    permission.get_required_permissions(request.method, model)
+                )
+            if hasattr(permission, "get_required_object_permissions"):
+                per_user = per_user or bool(
+                    permission.get_required_object_permissions(request.method, model)
+                )
+        granted = sorted(perm for perm in required if resolver.has_perms([perm]))
+        return (request.user.pk if per_user else None, granted)
+
+    def get_cache_key(self):
+        """
+        Get the cache key of the response to this request
+        :return:
+        """
+        request = self.request
+        value = "\0".join(
+            str(part)
+            for part in (
+                request.path,
+                sorted(request.query_params.lists()),
+                request.accepted_media_type,
+                self.get_cache_scope(),
+            )
+        )
+        return (
+            RESPONSE_KEY_PREFIX
+            + hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+        )
+
+    def get_cache_version(self):
+        """
+        Get the generations of the rendered models, an entry stored with
+        other generations is stale
+        :return:
+        """
+        generations = get_generations(
+            [get_model_generation_name(model) for model in self.cache_models]
+        )
+        return sorted(generations.items())
+
+    @staticmethod
+    def acquire_lock(key):
+        """
+        Take the render lock of key
+        :param key:
+        :return: lock token, None when another request holds it
+        """
+        token = uuid.uuid4().hex
+        if cache.add(key + ":lock", token, settings.RESPONSE_CACHE_LOCK_TIMEOUT):
+            return token
+        return None
+
+    @staticmethod
+    def release_lock(key, token):
+        """
+        Release the render lock of key, unless it expired and was taken again
+        :param key:
+        :param token:
+        :return:
+        """
+        if cache.get(key + ":lock") == token:
+            cache.delete(key + ":lock")
+
+    @staticmethod
+    def wait_for_entry(key, version):
+        """
+        Wait for the request holding the lock to store the entry, blocking
+        the calling thread
+        :param key:
+        :param version:
+        :return: the entry, None when the wait timed out
+        """
+        metrics.incr("response_cache.lock.wait")
+        deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None and entry[0] == version:
+                return entry
+            if cache.get(key + ":lock") is None:
+                break
+        metrics.incr("response_cache.lock.timeout")
+        return None
+
+    def cached_response(self, render):
+        """
+        Get the cached response, or a 304 when the client copy matches it,
+        else render the response and cache it once rendered, one request
+        per key at a time
+        :param render:
+        :return:
+        """
+        if not self.is_cacheable():
+            return render()
+        key = self.get_cache_key()
+        version = self.get_cache_version()
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            metrics.incr("response_cache.hit")
+            return self.replay(*entry[1:])
+
+        token = self.acquire_lock(key)
+        if token is None:
+            if entry is not None:
+                metrics.incr("response_cache.stale")
+                return self.replay(*entry[1:])
+            entry = self.wait_for_entry(key, version)
+            if entry is not None:
+                metrics.incr("response_cache.hit")
+                return self.replay(*entry[1:])
+
+        metrics.incr("response_cache.miss")
+        try:
+            response = render()
+        except Exception:
+            if token is not None:
+                self.release_lock(key, token)
+            raise
+        if isinstance(response, Response) and response.status_code == 200:
+            response.add_post_render_callback(
+                lambda rendered: self.store(key, version, rendered, token)
+            )
+        elif token is not None:
+            self.release_lock(key, token)
+        return response
+
+    def replay(self, content, content_type, headers):
+        """
+        Build a response from a cache entry
+        :param content:
+        :param content_type:
+        :param headers:
+        :return:
+        """
+        last_modified = headers.get("Last-Modified")
+        response = get_conditional_response(
+            self.request,
+            etag=headers.get("ETag"),
+            last_modified=last_modified and parse_http_date_safe(last_modified),
+        )
+        if response is None:
+            response = HttpResponse(content, content_type=content_type)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def store(self, key, version, response, token):
+        """
+        Cache a rendered response and release the render lock
+        :param key:
+        :param version:
+        :param response:
+        :param token: lock token, None when rendered without the lock
+        :return:
+        """
+        headers = {name: response[name] for name in CACHED_HEADERS if name in response}
+        cache.set(
+            key,
+            (version, response.content, response["Content-Type"], headers),
+            settings.RESPONSE_CACHE_TTL,
+        )
+        if token is not None:
+            self.release_lock(key, token)
+
+    def list(self, request, *args, **kwargs):
+        """
+        List, from the cache when nothing changed
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        return self.cached_response(
+            lambda: super(ResponseCacheMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve, from the cache when nothing changed
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        return self.cached_response(
+            lambda: super(ResponseCacheMixin, self).retrieve(request, *args, **kwargs)
+        )
@@ -0,0 +1,108 @@
+"""
+Blog full-text search
+
+PostgreSQL keeps a generated ``search_vector`` tsvector column on the post
+table, backed by a GIN index. SQLite keeps an FTS5 shadow table keyed by
+the post id, refreshed by triggers on the post table, so queryset updates,
+bulk writes and raw SQL keep it current as saves do. Both are created by
+the blog migrations. Any other database falls back to DRF's ILIKE search.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+SEARCH_CONFIG = "english"
+FTS_TABLE = "blog_post_fts"
+WORD_RE = re.compile(r"\w+")
+
+
+def has_shadow_table(connection):
+    """
+    Whether the FTS5 shadow table exists on a SQLite connection
+    :param connection:
+    :return:
+    """
+    if connection.vendor != "sqlite":
+        return False
+    available = getattr(connection, "_blog_fts_available", None)
+    if available is None:
+        with connection.cursor() as cursor:
+            available = FTS_TABLE in connection.introspection.table_names(cursor)
+        connection._blog_fts_available = available
+    return available
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Search filter backed by the post full-text index.
+
+    Every word of the search terms must match as a word prefix in the title
+    or the content, results are ordered by relevance (title matches weigh
+    more than content matches).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Filter queryset
+        :param request:
+        :param queryset:
+        :param view:
+        :return:
+        """
+        search_terms = self.get_search_terms(request)
+        if not self.get_search_fields(view, request) or not search_terms:
+            return queryset
+
+        words = [word for term in search_terms for word in WORD_RE.findall(term)]
+        if not words:
+            return queryset.none()
+
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        if connection.vendor == "postgresql":
+            query = " & ".join(f"{word}:*" for word in words)
+            tsquery = f"to_tsquery('{SEARCH_CONFIG}', %s)"
+            return (
+                queryset.filter(
+                    RawSQL(
+                        f"{table}.search_vector @@ {tsquery}",
+                        (query,),
+                        output_field=BooleanField(),
+                    )
+                )
+                .annotate(
+                    search_rank=RawSQL(
+                        f"ts_rank({table}.search_vector, {tsquery})",
+                        (query,),
+                        output_field=FloatField(),
+                    )
+                )
+                .order_by("-search_rank", *ordering)
+            )
+        if has_shadow_table(connection):
+            query = " ".join('"%s"*' % word for word in words)
+            return (
+                queryset.filter(
+                    RawSQL(
+                        f"{table}.id IN (SELECT rowid FROM {FTS_TABLE} "
+                        f"WHERE {FTS_TABLE} MATCH %s)",
+                        (query,),
+                        output_field=BooleanField(),
+                    )
+                )
+                .annotate(
+                    search_rank=RawSQL(
+                        f"SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+                        f"WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id",
+                        (query,),
+                        output_field=FloatField(),
+                    )
+                )
+                .order_by("-search_rank", *ordering)
+            )
+        return super().filter_queryset(request, queryset, view)
@@ -3,9 +3,23 @@ Blog serializers
 """
 
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.encoding import smart_str
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
+from .cache import bump_model_generation
+from .counters import add_post_count, add_taxonomy_counts
 from .models import Post, Category, Tag, Comment, Profile
+from .sparse import (
+    EXCERPT_ANNOTATION,
+    EXCERPT_FIELD,
+    get_excerpt_length,
+    get_expansions,
+    select_fields,
+)
+from .taxonomy import get_snapshot
+from .utils import BULK_BATCH_SIZE, bulk_set_related, cache_related
 
 User = get_user_model()
 
@@ -22,7 +36,7 @@ class CategorySerializer(serializers.ModelSerializer):
 
         model = Category
         fields = "__all__"
-        read_only_fields = ("id", "created_at", "updated_at", "slug")
+        read_only_fields = ("id", "created_at", "updated_at", "slug", "post_count")
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -37,22 +51,181 @@ class TagSerializer(serializers.ModelSerializer):
 
         model = Tag
         fields = "__all__"
-        read_only_fields = ("id", "created_at", "updated_at", "slug")
+        read_only_fields = ("id", "created_at", "updated_at", "slug", "post_count")
 
 
-class PostSerializer(serializers.ModelSerializer):
+class BatchedManyRelatedField(serializers.ManyRelatedField):
+    """
+    Many related field resolving every item with a single lookup
+    """
+
+    def to_internal_value(self, data):
+        """
+        Resolve all items at once
+        :param data:
+        :return:
+        """
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+        return self.child_relation.to_internal_values(data)
+
+
+class SnapshotSlugRelatedField(serializers.SlugRelatedField):
+    """
+    Slug related field resolved from the taxonomy snapshot
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        """
+        Use BatchedManyRelatedField for many=True
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchedManyRelatedField(**list_kwargs)
+
+    def to_internal_value(self, data):
+        """
+        Resolve slug from the snapshot
+        :param data:
+        :return:
+        """
+        return self.to_internal_values([data])[0]
+
+    def to_internal_values(self, data):
+        """
+        Resolve a list of slugs, from the snapshot first and then with one
+        query for the slugs the snapshot does not know yet. Every unknown
+        slug is reported at once.
+        :param data:
+        :return: objects in input order, without duplicates
+        """
+        if any(isinstance(item, (dict, list, bool)) for item in data):
+            self.fail("invalid")
+        slugs = list(dict.fromkeys(str(item) for item in data))
+        model = self.get_queryset().model
+        snapshot = get_snapshot()
+        resolved = {slug: snapshot.get_by_slug(model, slug) for slug in slugs}
+
+        missing = [slug for slug, _object in resolved.items() if _object is None]
+        if missing:
+            queryset = self.get_queryset().filter(
+                **{"%s__in" % self.slug_field: missing}
+            )
+            for _object in queryset:
+                slug = getattr(_object, self.slug_field)
+                if resolved.get(slug) is None:
+                    resolved[slug] = _object
+
+        errors = [
+            self.error_messages["does_not_exist"].format(
+                slug_name=self.slug_field, value=smart_str(slug)
+            )
+            for slug, _object in resolved.items()
+            if _object is None
+        ]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return list(resolved.values())
+
+
+class PostListSerializer(serializers.ListSerializer):
+    """
+    Post list serializer creating every post with bulk inserts
+    """
+
+    def create(self, validated_data):
+        """
+        Bulk create posts and their many-to-many rows
+        :param validated_data:
+        :return:
+        """
+        relations = [self.child.pop_relations(item) for item in validated_data]
+        posts = Post.objects.bulk_create(
+            [Post(**item) for item in validated_data], batch_size=BULK_BATCH_SIZE
+        )
+        bump_model_generation(Post)
+        for field_name in self.child.relation_fields:
+            added, _ = bulk_set_related(
+                Post,
+                field_name,
+                {
+                    post.pk: relation[field_name]
+                    for post, relation in zip(posts, relations)
+                    if field_name in relation
+                },
+            )
+            add_taxonomy_counts(field_name, added, 1)
+        authors = {}
+        for post in posts:
+            authors[post.author_id] = authors.get(post.author_id, 0) + 1
+        for author_id, count in authors.items():
+            add_post_count(author_id, count)
+        for post, relation in zip(posts, relations):
+            for field_name in self.child.relation_fields:
+                cache_related(post, field_name, relation.get(field_name, []))
+        return posts
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Serializer keeping the fields asked for by the fields, exclude, excerpt
+    and expand query params (see blog.sparse). Query params apply to the
+    top level serializer only, not to nested ones.
+    """
+
+    expandable = ()
+
+    def expand_fields(self, fields, expansions):
+        """
+        Replace or add the fields of expansions
+        :param fields:
+        :param expansions:
+        :return:
+        """
+        return fields
+
+    def get_fields(self):
+        """
+        Get fields
+        :return:
+        """
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return fields
+        request = self.context.get("request")
+        fields = self.expand_fields(fields, get_expansions(request, self.expandable))
+        fields = select_fields(request, fields)
+        if EXCERPT_FIELD in fields and get_excerpt_length(request) is not None:
+            fields[EXCERPT_FIELD] = serializers.CharField(
+                source=EXCERPT_ANNOTATION, read_only=True
+            )
+        return fields
+
+
+class PostSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Post serializer
     """
 
-    categories = serializers.SlugRelatedField(
+    categories = SnapshotSlugRelatedField(
         many=True,
         read_only=False,
         slug_field="slug",
         queryset=Category.objects.all(),
         required=False,
     )
-    tags = serializers.SlugRelatedField(
+    tags = SnapshotSlugRelatedField(
         many=True,
         read_only=False,
         slug_field="slug",
@@ -67,10 +240,87 @@ class PostSerializer(serializers.ModelSerializer):
 
         model = Post
         fields = "__all__"
-        read_only_fields = ("id", "created_at", "updated_at", "author")
+        read_only_fields = ("id", "created_at", "updated_at", "author", "comment_count")
+        list_serializer_class = PostListSerializer
+
+    relation_fields = ("categories", "tags")
+    expandable = ("author", "categories", "tags", "comments")
+
+    def expand_fields(self, fields, expansions):
+        """
+        Embed the public author profile, full categories and tags, and the latest
+        comments (prefetched in latest_comments)
+        :param fields:
+        :param expansions:
+        :return:
+        """
+        if "author" in expansions:
+            fields["author"] = AuthorSerializer(read_only=True)
+        if "categories" in expansions:
+            fields["categories"] = CategorySerializer(many=True, read_only=True)
+        if "tags" in expansions:
+            fields["tags"] = TagSerializer(many=True, read_only=True)
+        if "comments" in expansions:
+            fields["comments"] = CommentSerializer(
+                many=True, read_only=True, source="latest_comments"
+            )
+        return fields
+
+    def pop_relations(self, validated_data):
+        """
+        Pop many-to-many values out of validated data
+        :param validated_data:
+        :return:
+        """
+        return {
+            field_name: validated_data.pop(field_name)
+            for field_name in self.relation_fields
+            if field_name in validated_data
+        }
+
+    def set_relations(self, instance, relations, replace):
+        """
+        Write many-to-many values with one bulk insert per field
+        :param instance:
+        :param relations:
+        :param replace:
+        :return:
+        """
+        for field_name, objects in relations.items():
+            added, removed = bulk_set_related(
+                Post, field_name, {instance.pk: objects}, replace=replace
+            )
+            add_taxonomy_counts(field_name, added, 1)
+            add_taxonomy_counts(field_name, removed, -1)
+            cache_related(instance, field_name, objects)
 
+    def create(self, validated_data):
+        """
+        Create post, with its relations and counters or not at all
+        :param validated_data:
+        :return:
+        """
+        relations = self.pop_relations(validated_data)
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            self.set_relations(instance, relations, replace=False)
+        return instance
+
+    def update(self, instance, validated_data):
+        """
+        Update post, with its relations and counters or not at all
+        :param instance:
+        :param validated_data:
+        :return:
+        """
+        relations = self.pop_relations(validated_data)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            self.set_relations(instance, relations, replace=True)
+        return instance
 
-class CommentSerializer(serializers.ModelSerializer):
+
+class CommentSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Comment serializer
     """
@@ -113,4 +363,22 @@ class ProfileSerializer(serializers.ModelSerializer):
 
         model = Profile
         fields = "__all__"
-        read_only_fields = ("id", "created_at", "updated_at", "user")
+        read_only_fields = ("id", "created_at", "updated_at", "user", "post_count")
+
+
+class AuthorSerializer(serializers.ModelSerializer):
+    """
+    Public profile of an author, embedded in posts of any reader, without
+    the user email
+    """
+
+    username = serializers.CharField(read_only=True, source="user.username")
+
+    class Meta:
+        """
+        Meta class for author serializer
+        """
+
+        model = Profile
+        fields = ("id", "username", "bio", "profile_picture", "post_count")
+        read_only_fields = fields
@@ -0,0 +1,242 @@
+"""
+Blog signals
+"""
+
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_generation, bump_model_generation
+from .counters import add_comment_count, add_post_count, add_taxonomy_counts
+from .models import (
+    Category,
+    Comment,
+    Post,
+    Profile,
+    Tag,
+    TAXONOMY_GENERATION,
+    User,
+)
+from .permissions import invalidate_model_permissions
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, using, **kwargs):
+    """
+    Count a new post of its author
+    :param sender:
+    :param instance:
+    :param created:
+    :param using:
+    :param kwargs:
+    :return:
+    """
+    if created:
+        add_post_count(instance.author_id, 1, using=using)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, using, **kwargs):
+    """
+    Uncount a post from its author, categories and tags, before the delete
+    cascades to its category and tag links
+    :param sender:
+    :param instance:
+    :param using:
+    :param kwargs:
+    :return:
+    """
+    add_post_count(instance.author_id, -1, using=using)
+    for field_name in ("categories", "tags"):
+        through = Post._meta.get_field(field_name).remote_field.through
+        target = "%s_id" % Post._meta.get_field(field_name).m2m_reverse_field_name()
+        pairs = [
+            (instance.pk, target_id)
+            for target_id in through.objects.using(using)
+            .filter(post_id=instance.pk)
+            .values_list(target, flat=True)
+        ]
+        add_taxonomy_counts(field_name, pairs, -1, using=using)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, using, **kwargs):
+    """
+    Count a new comment of its post
+    :param sender:
+    :param instance:
+    :param created:
+    :param using:
+    :param kwargs:
+    :return:
+    """
+    if created:
+        add_comment_count(instance.post_id, 1, using=using)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, using, **kwargs):
+    """
+    Uncount a deleted comment of its post
+    :param sender:
+    :param instance:
+    :param using:
+    :param kwargs:
+    :return:
+    """
+    add_comment_count(instance.post_id, -1, using=using)
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_taxonomy_changed(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """
+    Count post and category or tag links added or removed through the
+    related managers, from either side
+    :param sender:
+    :param instance:
+    :param action:
+    :param reverse:
+    :param pk_set:
+    :param using:
+    :param kwargs:
+    :return:
+    """
+    field_name = "categories" if sender is Post.categories.through else "tags"
+    field = Post._meta.get_field(field_name)
+    source = "%s_id" % field.m2m_field_name()
+    target = "%s_id" % field.m2m_reverse_field_name()
+    lookup, column = (target, source) if reverse else (source, target)
+
+    if action in ("pre_remove", "pre_clear"):
+        # remove() reports every pk asked for, clear() none, keep the links
+        # that really exist
+        links = sender.objects.using(using).filter(**{lookup: instance.pk})
+        if pk_set is not None:
+            links = links.filter(**{"%s__in" % column: pk_set})
+        instance._removed_links = list(links.values_list(column, flat=True))
+        return
+    if action == "post_add":
+        other_ids, delta = pk_set, 1
+    elif action in ("post_remove", "post_clear"):
+        other_ids, delta = instance.__dict__.pop("_removed_links", ()), -1
+    else:
+        return
+    if reverse:
+        pairs = [(post_id, instance.pk) for post_id in other_ids]
+    else:
+        pairs = [(instance.pk, target_id) for target_id in other_ids]
+    add_taxonomy_counts(field_name, pairs, delta, using=using)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def model_changed(sender, using, **kwargs):
+    """
+    Invalidate the cached responses rendering a saved or deleted object
+    :param sender:
+    :param using:
+    :param kwargs:
+    :return:
+    """
+    bump_model_generation(sender, using=using)
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_links_changed(sender, action, using, **kwargs):
+    """
+    Invalidate the cached posts when their categories or tags change
+    :param sender:
+    :param action:
+    :param using:
+    :param kwargs:
+    :return:
+    """
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_model_generation(Post, using=using)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def taxonomy_deleted(sender, instance, using, **kwargs):
+    """
+    Invalidate the taxonomy snapshot when a category or tag is deleted
+    :param sender:
+    :param instance:
+    :param using:
+    :param kwargs:
+    :return:
+    """
+    bump_generation(TAXONOMY_GENERATION, using=using)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_permissions_changed(sender, instance, action, using, **kwargs):
+    """
+    Invalidate cached model permissions when user groups or permissions
+    change
+    :param sender:
+    :param instance:
+    :param action:
+    :param using:
+    :param kwargs:
+    :return:
+    """
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if isinstance(instance, User):
+        invalidate_model_permissions(instance.pk, using=using)
+    else:
+        invalidate_model_permissions(using=using)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    """
+    Invalidate every cached model permissions when group permissions change
+    :param sender:
+    :param action:
+    :param kwargs:
+    :return:
+    """
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_model_permissions(using=kwargs.get("using"))
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def permission_deleted(sender, **kwargs):
+    """
+    Invalidate every cached model permissions when a group or a permission
+    is deleted
+    :param sender:
+    :param kwargs:
+    :return:
+    """
+    invalidate_model_permissions(using=kwargs.get("using"))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """
+    Invalidate cached model permissions of a saved or deleted user, which
+    covers is_active and is_superuser changes
+    :param sender:
+    :param instance:
+    :param kwargs:
+    :return:
+    """
+    invalidate_model_permissions(instance.pk, using=kwargs.get("using"))
+    # profiles render the user email
+    bump_model_generation(Profile, using=kwargs.get("using"))
@@ -0,0 +1,145 @@
+"""
+Blog sparse fieldsets
+
+GET requests may narrow the representation with ``?fields=a,b`` or
+``?exclude=a,b``, ask for ``?excerpt=N`` to get only the first N
+characters of the content, cut in the database, and embed related objects
+with ``?expand=a,b``. The queryset loads only the columns and relations the
+kept fields need.
+"""
+
+from django.db.models import Prefetch
+from django.db.models.functions import Substr
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = "fields"
+EXCLUDE_PARAM = "exclude"
+EXPAND_PARAM = "expand"
+EXCERPT_PARAM = "excerpt"
+EXCERPT_FIELD = "content"
+EXCERPT_ANNOTATION = "content_excerpt"
+
+
+def get_param_list(request, param):
+    """
+    Get the comma separated values of a query param
+    :param request:
+    :param param:
+    :return:
+    """
+    value = request.query_params.get(param) or ""
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def get_expansions(request, expandable):
+    """
+    Get the expansions asked for by the expand param
+    :param request:
+    :param expandable:
+    :return:
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return set()
+    expansions = get_param_list(request, EXPAND_PARAM)
+    unknown = expansions - set(expandable)
+    if unknown:
+        raise ValidationError(
+            {EXPAND_PARAM: "Unknown expansions: %s." % ", ".join(sorted(unknown))}
+        )
+    return expansions
+
+
+def select_fields(request, fields):
+    """
+    Drop the serializer fields left out by the fields and exclude params
+    :param request:
+    :param fields: mapping of field name to field
+    :return:
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return fields
+    included = get_param_list(request, FIELDS_PARAM)
+    excluded = get_param_list(request, EXCLUDE_PARAM)
+    for param, names in ((FIELDS_PARAM, included), (EXCLUDE_PARAM, excluded)):
+        unknown = names - set(fields)
+        if unknown:
+            raise ValidationError(
+                {param: "Unknown fields: %s." % ", ".join(sorted(unknown))}
+            )
+    for name in list(fields):
+        if (included and name not in included) or name in excluded:
+            del fields[name]
+    return fields
+
+
+def get_excerpt_length(request):
+    """
+    Get the excerpt length asked for, None for the full content
+    :param request:
+    :return:
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    value = request.query_params.get(EXCERPT_PARAM)
+    if not value:
+        return None
+    try:
+        length = int(value)
+    except ValueError:
+        length = 0
+    if length < 1:
+        raise ValidationError({EXCERPT_PARAM: "A positive integer is required."})
+    return length
+
+
+class SparseFieldsMixin:
+    """
+    Load only what the fields kept in the representation need.
+
+    Views list in ``prefetches`` the relations to prefetch when their field
+    is kept, and in ``required_columns`` the columns always loaded (ordering,
+    pagination and conditional request validators rely on them).
+    """
+
+    prefetches = {}
+    required_columns = ("id", "created_at", "updated_at")
+
+    def get_queryset(self):
+        """
+        Get queryset narrowed to the kept fields
+        :return:
+        """
+        queryset = super().get_queryset()
+        fields = self.get_serializer().fields
+        model = queryset.model
+        columns = set(self.required_columns)
+        for field in fields.values():
+            name = field.source.split(".")[0]
+            prefetch = self.get_prefetch(name)
+            if prefetch is not None:
+                queryset = queryset.prefetch_related(prefetch)
+            elif name != "*":
+                columns.add(name)
+
+        excerpt = get_excerpt_length(self.request)
+        if excerpt is not None and EXCERPT_ANNOTATION in columns:
+            columns.remove(EXCERPT_ANNOTATION)
+            queryset = queryset.annotate(
+                **{EXCERPT_ANNOTATION: Substr(EXCERPT_FIELD, 1, excerpt)}
+            )
+
+        concrete = {field.name for field in model._meta.concrete_fields}
+        if columns <= concrete:
+            queryset = queryset.only(*columns)
+        return queryset
+
+    def get_prefetch(self, name):
+        """
+        Get the Prefetch loading the field sourced from name, None for columns
+        :param name:
+        :return:
+        """
+        if name in self.prefetches:
+            return Prefetch(name, queryset=self.prefetches[name].all())
+        return None
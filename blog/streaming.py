@@ -0,0 +1,104 @@
+"""
+Blog streaming lists
+
+Post and comment list pages of LIST_STREAMING_MIN_PAGE_SIZE rows or more
+are not built in memory: the page is a values() queryset iterated with a
+server-side cursor, LIST_STREAMING_CHUNK_SIZE rows at a time, each chunk
+represented by the fast path (see blog.fastpath) and encoded by the
+accepted renderer before the next one is fetched. The memory used stays the
+same whatever the page size. The bytes sent are the ones the regular
+response would have, the pagination envelope around the results included.
+
+Only JSON renders of serializers the fast path supports are streamed.
+Streamed responses are not kept by the response cache, and an error while
+streaming cuts the response short, as its status is already sent.
+"""
+
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+
+
+class StreamingListMixin:
+    """
+    Stream large list pages.
+
+    Views use a paginator with paginate_queryset_lazily, such as
+    CreatedAtPagination, and FastListMixin.
+    """
+
+    request = None
+
+    def is_streamed(self):
+        """
+        Whether the list of this request is streamed
+        :return:
+        """
+        request = self.request
+        paginator = self.paginator
+        return bool(
+            getattr(request, "accepted_renderer", None) is not None
+            and request.accepted_renderer.format == "json"
+            and hasattr(paginator, "paginate_queryset_lazily")
+            and paginator.get_page_size(request)
+            >= settings.LIST_STREAMING_MIN_PAGE_SIZE
+        )
+
+    def stream(self, envelope, representation, rows):
+        """
+        Encode the envelope, with rows represented chunk by chunk in place
+        of its empty results
+        :param envelope: data of a paginated response to an empty page
+        :param representation:
+        :param rows: values() queryset of the page
+        :return:
+        """
+        renderer = self.request.accepted_renderer
+        media_type = self.request.accepted_media_type
+        context = self.get_renderer_context()
+        content = renderer.render(envelope, media_type, context)
+        # results is the last key of the envelope
+        split = content.rindex(b"[]") + 1
+        yield content[:split]
+        chunk_size = settings.LIST_STREAMING_CHUNK_SIZE
+        iterator = rows.iterator(chunk_size=chunk_size)
+        separator = b""
+        while chunk := list(islice(iterator, chunk_size)):
+            items = renderer.render(
+                representation.represent(chunk), media_type, context
+            )
+            yield separator + items.strip()[1:-1]
+            separator = b","
+        yield content[split:]
+
+    def list(self, request, *args, **kwargs):
+        """
+        List, streamed when the page is large
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        if not self.is_streamed():
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        representation = (
+            self.get_values_representation(queryset)
+            if isinstance(queryset, QuerySet)
+            else None
+        )
+        if representation is None:
+            return self.list_queryset(queryset, None)
+        page = self.paginator.paginate_queryset_lazily(queryset, request, view=self)
+        envelope = self.paginator.get_paginated_response([]).data
+        renderer = request.accepted_renderer
+        return StreamingHttpResponse(
+            self.stream(envelope, representation, representation.get_rows(page)),
+            content_type=(
+                "%s; charset=%s" % (renderer.media_type, renderer.charset)
+                if renderer.charset
+                else renderer.media_type
+            ),
+        )
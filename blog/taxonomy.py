@@ -0,0 +1,116 @@
+"""
+Blog taxonomy snapshot
+
+Categories and tags are small and rarely change, so every worker keeps an
+immutable in-memory snapshot of both tables. The snapshot is rebuilt when
+the taxonomy generation changes (see Slug.save and the delete signal) or
+when it gets older than TAXONOMY_SNAPSHOT_MAX_AGE seconds.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+
+from .cache import get_generation
+from .models import Category, Tag, TAXONOMY_GENERATION
+
+
+class TaxonomySnapshot:
+    """
+    Immutable snapshot of categories and tags
+    """
+
+    def __init__(self, version, items):
+        """
+        Initialize
+        :param version:
+        :param items: mapping of model to its instances in default ordering
+        """
+        self.version = version
+        self.built_at = time.monotonic()
+        self.items = {model: tuple(objects) for model, objects in items.items()}
+        self.by_id = {
+            model: {obj.pk: obj for obj in objects}
+            for model, objects in self.items.items()
+        }
+        self.by_slug = {}
+        for model, objects in self.items.items():
+            by_slug = self.by_slug[model] = {}
+            for obj in objects:
+                by_slug.setdefault(obj.slug, obj)
+
+    @classmethod
+    def build(cls, version):
+        """
+        Load a snapshot from the database
+        :param version:
+        :return:
+        """
+        return cls(version, {Category: Category.objects.all(), Tag: Tag.objects.all()})
+
+    def is_current(self, version):
+        """
+        Whether the snapshot matches version and is fresh enough
+        :param version:
+        :return:
+        """
+        age = time.monotonic() - self.built_at
+        return self.version == version and age < settings.TAXONOMY_SNAPSHOT_MAX_AGE
+
+    def all(self, model):
+        """
+        All objects of model
+        :param model:
+        :return:
+        """
+        return self.items[model]
+
+    def filter(self, model, slug=None):
+        """
+        Objects of model, optionally filtered on slug
+        :param model:
+        :param slug:
+        :return:
+        """
+        if slug is None:
+            return list(self.items[model])
+        return [obj for obj in self.items[model] if obj.slug == slug]
+
+    def get(self, model, pk):
+        """
+        Object of model by primary key or None
+        :param model:
+        :param pk:
+        :return:
+        """
+        return self.by_id[model].get(pk)
+
+    def get_by_slug(self, model, slug):
+        """
+        Object of model by slug or None
+        :param model:
+        :param slug:
+        :return:
+        """
+        return self.by_slug[model].get(slug)
+
+
+_SNAPSHOT = None
+_LOCK = threading.Lock()
+
+
+def get_snapshot():
+    """
+    Get the current taxonomy snapshot, rebuilding it if needed
+    :return:
+    """
+    global _SNAPSHOT  # pylint: disable=global-statement
+    version = get_generation(TAXONOMY_GENERATION)
+    snapshot = _SNAPSHOT
+    if snapshot is None or not snapshot.is_current(version):
+        with _LOCK:
+            snapshot = _SNAPSHOT
+            if snapshot is None or not snapshot.is_current(version):
+                snapshot = _SNAPSHOT = TaxonomySnapshot.build(version)
+    return snapshot
@@ -2,14 +2,57 @@
 Blog tests cases
 """
 
+import json
+import tempfile
+import threading
+import time
+import uuid
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from guardian.core import ObjectPermissionChecker
+from guardian.models import UserObjectPermission
 from guardian.shortcuts import assign_perm
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import Permission
-from django.test import TestCase
-from rest_framework.test import APIClient
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Post, Profile, Comment
+from plusone import metrics
+from plusone.fastjson import ORJSONParser, ORJSONRenderer
+
+from .management.commands.benchmark_json import Command as BenchmarkJSONCommand
+from .models import (
+    Post,
+    Profile,
+    Comment,
+    Category,
+    Tag,
+    PostUserObjectPermission,
+)
+from .pagination import CreatedAtPagination, KeysetPagination
+from .permissions import (
+    PermissionResolver,
+    get_model_permissions,
+    get_model_permissions_key,
+)
+from .responsecache import RESPONSE_KEY_PREFIX, ResponseCacheMixin
+from .search import FTS_TABLE, has_shadow_table
+from .taxonomy import get_snapshot
+from .views import PostViewSet
 
 User = get_user_model()
 
@@ -39,6 +82,8 @@ class ProfileTest(TestCase):
         ).values_list("id", flat=True)
         _user.user_permissions.add(*_permission)
         self.client = APIClient()
+        # responses cached from rolled back test data must not leak
+        self.addCleanup(cache.clear)
 
     @staticmethod
     def get_token(user):
@@ -79,6 +124,121 @@ class ProfileTest(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+class TaxonomyTest(TestCase):
+    """
+    Category and tag test cases
+    """
+
+    def setUp(self):
+        """
+        create user
+        :return:
+        """
+        _user = User.objects.create_user(
+            email="exist@test.local",
+            username="exist_local",
+            password="T@eST1926",
+        )
+        self.token = str(RefreshToken.for_user(_user).access_token)
+        self.client = APIClient()
+        # snapshots and responses built from rolled back test data must not leak
+        self.addCleanup(cache.clear)
+
+    def get(self, url):
+        """
+        get url as the test user
+        :param url:
+        :return:
+        """
+        return self.client.get(url, headers={"Authorization": f"Bearer {self.token}"})
+
+    def test_category_list_from_snapshot(self):
+        """
+        test list category does not query the taxonomy tables
+        :return:
+        """
+        self.get("/api/categories/")
+        with self.assertNumQueries(0):
+            response = self.get("/api/categories/?slug=category-3")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["name"], "Category 3")
+
+    def test_tag_retrieve_from_snapshot(self):
+        """
+        test retrieve tag does not query the taxonomy tables
+        :return:
+        """
+        _tag = Tag.objects.get(slug="tag-1")
+        self.get("/api/tags/")
+        with self.assertNumQueries(0):
+            response = self.get(f"/api/tags/{_tag.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["slug"], "tag-1")
+        self.assertEqual(self.get("/api/tags/0/").status_code, 404)
+
+    def test_snapshot_invalidation(self):
+        """
+        test save and delete invalidate the snapshot
+        :return:
+        """
+        self.get("/api/tags/")
+        _tag = Tag.objects.create(name="New Tag")
+        response = self.get("/api/tags/?slug=new-tag")
+        self.assertEqual(response.data["count"], 1)
+        _tag.name = "Renamed Tag"
+        _tag.save()
+        self.assertEqual(self.get("/api/tags/?slug=new-tag").data["count"], 0)
+        Tag.objects.filter(slug="renamed-tag").delete()
+        self.assertEqual(self.get(f"/api/tags/{_tag.id}/").status_code, 404)
+
+    def test_taxonomy_conditional_get(self):
+        """
+        test unchanged taxonomy lists are answered with 304
+        :return:
+        """
+        response = self.get("/api/categories/")
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                "/api/categories/",
+                headers={
+                    "Authorization": f"Bearer {self.token}",
+                    "If-None-Match": etag,
+                },
+            )
+        self.assertEqual(response.status_code, 304)
+        Category.objects.create(name="New Category")
+        response = self.client.get(
+            "/api/categories/",
+            headers={"Authorization": f"Bearer {self.token}", "If-None-Match": etag},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class ProfileBackfillTest(TestCase):
+    """
+    Profile backfill test cases
+    """
+
+    def test_backfill_profiles(self):
+        """
+        test backfill command creates missing profiles only
+        :return:
+        """
+        _users = [
+            User.objects.create_user(
+                email=f"user{i}@test.local", username=f"user{i}", password="T@eST1926"
+            )
+            for i in range(5)
+        ]
+        _profile = Profile.objects.create(user=_users[0], bio="kept")
+        call_command("backfill_profiles", batch_size=2, stdout=StringIO())
+        self.assertFalse(User.objects.filter(user_profile__isnull=True).exists())
+        self.assertEqual(Profile.objects.get(user=_users[0]).bio, "kept")
+
+
 class PostTest(TestCase):
     """
     Post test cases
@@ -105,6 +265,8 @@ class PostTest(TestCase):
         _user.user_permissions.add(*_permission)
         _user_2.user_permissions.add(*_permission)
         self.client = APIClient()
+        # responses cached from rolled back test data must not leak
+        self.addCleanup(cache.clear)
 
     @staticmethod
     def get_token(user):
@@ -143,6 +305,209 @@ class PostTest(TestCase):
         )
         self.assertEqual(response.status_code, 201)
 
+    @override_settings(LAST_LOGIN_FLUSH_INTERVAL=0)
+    def test_post_create_profile_claim(self):
+        """
+        test create post with a token carrying the profile id
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _profile = Profile.objects.create(user=_user)
+        tokens = self.client.post(
+            "/api/auth/token/", {"email": "exist@test.local", "password": "T@eST1926"}
+        )
+        _data = {"title": "test", "content": "test"}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/posts/",
+                _data,
+                headers={"Authorization": f"Bearer {tokens.data['access']}"},
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["author"], _profile.id)
+        self.assertFalse(
+            any('FROM "blog_profile"' in query["sql"] for query in queries)
+        )
+
+    def test_post_create_direct_permissions(self):
+        """
+        test create post stores object permissions in the post table
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        _data = {
+            "title": "test",
+            "content": "test",
+        }
+        response = self.client.post(
+            "/api/posts/", _data, headers={"Authorization": f"Bearer {_token}"}
+        )
+        self.assertEqual(
+            PostUserObjectPermission.objects.filter(
+                content_object_id=response.data["id"], user=_user
+            ).count(),
+            2,
+        )
+        self.assertFalse(UserObjectPermission.objects.exists())
+
+    def test_post_create_taxonomy(self):
+        """
+        test create post with categories and tags
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        _data = {
+            "title": "test",
+            "content": "test",
+            "categories": ["category-1", "category-2"],
+            "tags": ["tag-1"],
+        }
+        response = self.client.post(
+            "/api/posts/", _data, headers={"Authorization": f"Bearer {_token}"}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["categories"], ["category-1", "category-2"])
+        self.assertEqual(response.data["tags"], ["tag-1"])
+        _data["tags"] = ["tag-1", "missing", "unknown"]
+        response = self.client.post(
+            "/api/posts/", _data, headers={"Authorization": f"Bearer {_token}"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data["tags"]), 2)
+
+    def test_post_create_taxonomy_atomic(self):
+        """
+        test a post whose relations fail to be written is not created
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        _data = {
+            "title": "atomic",
+            "content": "test",
+            "categories": ["category-1"],
+            "tags": ["tag-1"],
+        }
+        with mock.patch(
+            "blog.serializers.add_taxonomy_counts",
+            side_effect=[None, None, RuntimeError],
+        ), self.assertRaises(RuntimeError):
+            self.client.post(
+                "/api/posts/", _data, headers={"Authorization": f"Bearer {_token}"}
+            )
+        self.assertFalse(Post.objects.filter(title="atomic").exists())
+        self.assertFalse(Post.categories.through.objects.exists())
+
+    def test_post_create_taxonomy_num_queries(self):
+        """
+        test create post queries do not grow with the number of tags
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        _counts = []
+        # the first create warms up the profile and the taxonomy snapshot
+        for tags in ([], ["tag-1"], [f"tag-{i}" for i in range(10)]):
+            _data = {"title": "test", "content": "test", "tags": tags}
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    "/api/posts/",
+                    _data,
+                    headers={"Authorization": f"Bearer {_token}"},
+                )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.data["tags"]), len(tags))
+            _counts.append(len(queries))
+        self.assertEqual(_counts[1], _counts[2])
+
+    def test_post_update_taxonomy(self):
+        """
+        test update post categories and tags
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        _data = {"title": "test", "content": "test", "tags": ["tag-1", "tag-2"]}
+        post = self.client.post(
+            "/api/posts/", _data, headers={"Authorization": f"Bearer {_token}"}
+        )
+        response = self.client.patch(
+            f"/api/posts/{post.data['id']}/",
+            {"tags": ["tag-2", "tag-3"]},
+            headers={"Authorization": f"Bearer {_token}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["tags"], ["tag-2", "tag-3"])
+        self.assertEqual(
+            list(
+                Post.objects.get(id=post.data["id"]).tags.values_list("slug", flat=True)
+            ),
+            ["tag-2", "tag-3"],
+        )
+
+    def test_post_bulk_create(self):
+        """
+        test bulk create posts
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        _counts = []
+        # the first batch warms up the profile and the taxonomy snapshot
+        for size in (1, 2, 10):
+            _data = [
+                {
+                    "title": f"bulk {i}",
+                    "content": "bulk content",
+                    "categories": ["category-1"],
+                    "tags": ["tag-1", "tag-2"],
+                }
+                for i in range(size)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    "/api/posts/bulk/",
+                    _data,
+                    format="json",
+                    headers={"Authorization": f"Bearer {_token}"},
+                )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.data), size)
+            self.assertEqual(response.data[0]["tags"], ["tag-1", "tag-2"])
+            _counts.append(len(queries))
+        self.assertEqual(_counts[1], _counts[2])
+        self.assertEqual(Post.objects.filter(tags__slug="tag-2").count(), 13)
+        _checker = ObjectPermissionChecker(_user)
+        _post = Post.objects.get(id=response.data[-1]["id"])
+        self.assertTrue(_checker.has_perm("change_post", _post))
+        self.assertTrue(_checker.has_perm("delete_post", _post))
+        response = self.client.get(
+            "/api/posts/?search=bulk", headers={"Authorization": f"Bearer {_token}"}
+        )
+        self.assertEqual(response.data["count"], 13)
+
+    def test_post_bulk_create_invalid(self):
+        """
+        test bulk create posts rejects the whole batch
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        _data = [
+            {"title": "bulk", "content": "bulk"},
+            {"title": "bulk", "content": "bulk", "tags": ["missing"]},
+        ]
+        response = self.client.post(
+            "/api/posts/bulk/",
+            _data,
+            format="json",
+            headers={"Authorization": f"Bearer {_token}"},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Post.objects.exists())
+
     def test_post_retrieve(self):
         """
         test create post
@@ -242,6 +607,660 @@ class PostTest(TestCase):
         )
         self.assertEqual(response.status_code, 403)
 
+    def test_post_list_num_queries(self):
+        """
+        test list post query budget does not grow with page size
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        for _ in range(5):
+            _post = self.post_create(_user)
+            _post.categories.set(Category.objects.all()[:3])
+            _post.tags.set(Tag.objects.all()[:3])
+        # the taxonomy snapshot is built once per worker
+        get_snapshot()
+        # user, count, posts, categories, tags
+        with self.assertNumQueries(5):
+            response = self.client.get(
+                "/api/posts/", headers={"Authorization": f"Bearer {_token}"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"][0]["tags"]), 3)
+
+    def test_post_retrieve_num_queries(self):
+        """
+        test retrieve post query budget
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        _post = self.post_create(_user)
+        _post.categories.set(Category.objects.all()[:3])
+        _post.tags.set(Tag.objects.all()[:3])
+        # the taxonomy snapshot is built once per worker
+        get_snapshot()
+        # user, post, categories, tags
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                f"/api/posts/{_post.id}/",
+                headers={"Authorization": f"Bearer {_token}"},
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["categories"]), 3)
+
+    def test_post_list_cursor(self):
+        """
+        test list post with keyset pagination
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        _ids = [self.post_create(_user).id for _ in range(25)]
+        seen = []
+        url = "/api/posts/?cursor="
+        while url:
+            response = self.client.get(
+                url, headers={"Authorization": f"Bearer {_token}"}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            seen.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(seen, sorted(_ids, reverse=True))
+        response = self.client.get(
+            response.data["previous"], headers={"Authorization": f"Bearer {_token}"}
+        )
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            sorted(_ids, reverse=True)[10:20],
+        )
+
+    def test_post_list_invalid_cursor(self):
+        """
+        test list post with invalid cursor
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        response = self.client.get(
+            "/api/posts/?cursor=invalid",
+            headers={"Authorization": f"Bearer {_token}"},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_list_cursor_ordering(self):
+        """
+        test keyset pages reject orderings other than newest first
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        headers = {"Authorization": f"Bearer {_token}"}
+        self.post_create(_user)
+        for query in (
+            "ordering=title",
+            "ordering=comment_count",
+            "ordering=created_at",
+            "search=test",
+            "ordering=title&page_size=100",
+        ):
+            response = self.client.get(f"/api/posts/?{query}&cursor=", headers=headers)
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn("cursor", response.data)
+        response = self.client.get(
+            "/api/posts/?ordering=-created_at&cursor=", headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_search(self):
+        """
+        test search post
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        _profile, _ = Profile.objects.get_or_create(bio="test", user=_user)
+        _content = Post.objects.create(
+            title="weekly notes", content="Running a database", author=_profile
+        )
+        _title = Post.objects.create(
+            title="Databases in production", content="notes", author=_profile
+        )
+        Post.objects.create(title="unrelated", content="other", author=_profile)
+        response = self.client.get(
+            "/api/posts/?search=database",
+            headers={"Authorization": f"Bearer {_token}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [_title.id, _content.id],
+        )
+        _title.title = "renamed"
+        _title.save()
+        _content.delete()
+        response = self.client.get(
+            "/api/posts/?search=database",
+            headers={"Authorization": f"Bearer {_token}"},
+        )
+        self.assertEqual(response.data["results"], [])
+        response = self.client.get(
+            "/api/posts/?search=notes",
+            headers={"Authorization": f"Bearer {_token}"},
+        )
+        self.assertEqual([item["id"] for item in response.data["results"]], [_title.id])
+
+        # writes bypassing save keep the index current too
+        Post.objects.filter(id=_title.id).update(title="zebra")
+        _title.content = "giraffe"
+        Post.objects.bulk_update([_title], ["content"])
+        for search, ids in (("zebra", [_title.id]), ("giraffe", [_title.id])):
+            response = self.client.get(
+                f"/api/posts/?search={search}",
+                headers={"Authorization": f"Bearer {_token}"},
+            )
+            self.assertEqual([item["id"] for item in response.data["results"]], ids)
+        Post.objects.filter(id=_title.id).delete()
+        if has_shadow_table(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+                self.assertEqual(cursor.fetchone()[0], Post.objects.count())
+
+    @override_settings(RESPONSE_CACHE_TTL=0)
+    def test_post_conditional_get(self):
+        """
+        test unchanged posts are answered with 304 without serialization
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        _post = self.post_create(_user)
+        headers = {"Authorization": f"Bearer {_token}"}
+        response = self.client.get("/api/posts/", headers=headers)
+        etag = response["ETag"]
+        # validators come from the model generations, the user is cached
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                "/api/posts/", headers={**headers, "If-None-Match": etag}
+            )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get("/api/posts/?cursor=", headers=headers)
+        cursor_etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                "/api/posts/?cursor=", headers={**headers, "If-None-Match": cursor_etag}
+            )
+        self.assertEqual(response.status_code, 304)
+        # comment counts are rendered without touching the post
+        Comment.objects.create(post=_post, author=_post.author, content="c")
+        response = self.client.get(
+            "/api/posts/?cursor=", headers={**headers, "If-None-Match": cursor_etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        etag = self.client.get("/api/posts/", headers=headers)["ETag"]
+        response = self.client.get(
+            "/api/posts/?page=1", headers={**headers, "If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(f"/api/posts/{_post.id}/", headers=headers)
+        post_etag = response["ETag"]
+        # counters and embedded rows are not covered by updated_at
+        self.assertNotIn("Last-Modified", response)
+        response = self.client.get(
+            f"/api/posts/{_post.id}/",
+            headers={**headers, "If-Modified-Since": http_date(time.time() + 60)},
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            f"/api/posts/{_post.id}/", headers={**headers, "If-None-Match": post_etag}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        _post.title = "new"
+        _post.save()
+        response = self.client.get(
+            "/api/posts/", headers={**headers, "If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            f"/api/posts/{_post.id}/", headers={**headers, "If-None-Match": post_etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["title"], "new")
+
+    @override_settings(CONDITIONAL_GET=False, RESPONSE_CACHE_TTL=0)
+    def test_post_conditional_get_disabled(self):
+        """
+        test no validators are sent when generations are not shared
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        _post = self.post_create(_user)
+        headers = {"Authorization": f"Bearer {_token}"}
+        response = self.client.get("/api/posts/", headers=headers)
+        self.assertNotIn("ETag", response)
+        response = self.client.get(f"/api/posts/{_post.id}/", headers=headers)
+        self.assertNotIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+
+    def test_post_list_sparse_fields(self):
+        """
+        test fields, exclude and excerpt narrow the payload and the query
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        _post = self.post_create(_user)
+        _post.content = "a long enough content"
+        _post.save()
+        _post.categories.set(Category.objects.all()[:2])
+        headers = {"Authorization": f"Bearer {_token}"}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/posts/?fields=id,title", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data["results"][0]), {"id", "title"})
+        sql = " ".join(query["sql"] for query in queries)
+        self.assertNotIn('"blog_post"."content"', sql)
+        self.assertNotIn("blog_post_categories", sql)
+
+        response = self.client.get(
+            f"/api/posts/{_post.id}/?exclude=content,tags", headers=headers
+        )
+        self.assertNotIn("content", response.data)
+        self.assertNotIn("tags", response.data)
+        self.assertEqual(len(response.data["categories"]), 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/posts/?excerpt=6", headers=headers)
+        self.assertEqual(response.data["results"][0]["content"], "a long")
+        self.assertEqual(response.data["results"][0]["title"], "test")
+        sql = " ".join(query["sql"] for query in queries)
+        # the content column is only read through SUBSTR
+        self.assertEqual(sql.count('"blog_post"."content"'), 1)
+        self.assertIn('SUBSTR("blog_post"."content", 1, 6)', sql)
+
+        response = self.client.get("/api/posts/?fields=unknown", headers=headers)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/posts/?excerpt=-1", headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_list_expand(self):
+        """
+        test expand embeds author, comments, categories and tags with one
+        query per expansion for the whole page
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        headers = {"Authorization": f"Bearer {_token}"}
+        self.client.get("/api/posts/", headers=headers)
+        for _ in range(3):
+            _post = self.post_create(_user)
+            _post.categories.set(Category.objects.all()[:2])
+            Comment.objects.bulk_create(
+                Comment(post=_post, author=_post.author, content=f"comment {i}")
+                for i in range(7)
+            )
+        url = "/api/posts/?expand=author,comments,categories,tags"
+        # count, posts with authors, categories, tags, comments
+        with self.assertNumQueries(5):
+            response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        _item = response.data["results"][0]
+        self.assertEqual(_item["author"]["username"], "exist_local")
+        self.assertNotIn("user", _item["author"])
+        self.assertNotIn("exist@test.local", response.content.decode())
+        self.assertEqual(len(_item["categories"]), 2)
+        self.assertIn("name", _item["categories"][0])
+        self.assertEqual(
+            [comment["content"] for comment in _item["comments"]],
+            [f"comment {i}" for i in range(6, 1, -1)],
+        )
+
+        # expanded lists fall back to the serializer without filtering again
+        for query in ("expand=author", "expand=author&page_size=100"):
+            with mock.patch(
+                "blog.views.PostViewSet.filter_queryset",
+                autospec=True,
+                side_effect=PostViewSet.filter_queryset,
+            ) as filter_queryset:
+                response = self.client.get(f"/api/posts/?{query}", headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["results"]), 3)
+            self.assertEqual(filter_queryset.call_count, 1)
+
+        response = self.client.get(
+            f"/api/posts/{_post.id}/?expand=author&fields=id,author", headers=headers
+        )
+        self.assertEqual(response.data["author"]["id"], _post.author_id)
+        response = self.client.get("/api/posts/?expand=unknown", headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_counters(self):
+        """
+        test counters follow creates and deletes and can be reconciled
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        headers = {"Authorization": f"Bearer {_token}"}
+        _data = {"title": "test", "content": "test", "categories": ["category-1"]}
+        response = self.client.post("/api/posts/", _data, headers=headers)
+        self.assertEqual(response.data["comment_count"], 0)
+        _post = Post.objects.get(id=response.data["id"])
+        _other = Post.objects.create(title="other", content="b", author=_post.author)
+        _category = Category.objects.get(slug="category-1")
+        self.assertEqual(_category.post_count, 1)
+        self.assertEqual(Profile.objects.get(user=_user).post_count, 2)
+
+        etag = self.client.get(f"/api/posts/{_post.id}/", headers=headers)["ETag"]
+        _comment = Comment.objects.create(post=_post, author=_post.author, content="a")
+        Comment.objects.create(post=_post, author=_post.author, content="b")
+        _comment.delete()
+        updated_at = _post.updated_at
+        _post.refresh_from_db()
+        self.assertEqual(_post.comment_count, 1)
+        # counters are not a change of the post itself
+        self.assertEqual(_post.updated_at, updated_at)
+        response = self.client.get(
+            f"/api/posts/{_post.id}/", headers={**headers, "If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            "/api/posts/?ordering=-comment_count", headers=headers
+        )
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]], [_post.id, _other.id]
+        )
+
+        _category.category_posts.remove(_other)
+        _category.category_posts.add(_other)
+        _other.categories.clear()
+        _category.refresh_from_db()
+        self.assertEqual(_category.post_count, 1)
+        _post.delete()
+        _category.refresh_from_db()
+        self.assertEqual(_category.post_count, 0)
+        self.assertEqual(Profile.objects.get(user=_user).post_count, 1)
+
+        Profile.objects.update(post_count=42)
+        Category.objects.update(post_count=42)
+        stdout = StringIO()
+        call_command("reconcile_counters", batch_size=2, stdout=stdout)
+        self.assertEqual(Profile.objects.get(user=_user).post_count, 1)
+        self.assertFalse(Category.objects.exclude(post_count=0).exists())
+
+    @override_settings(RESPONSE_CACHE_TTL=0)
+    def test_list_fast_path_parity(self):
+        """
+        test lists built from values() rows match the serializers
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        headers = {"Authorization": f"Bearer {_token}"}
+        for i in range(4):
+            _post = self.post_create(_user)
+            _post.title = "title %d é\u2028" % i
+            _post.save()
+            _post.categories.set(Category.objects.all()[: i + 1])
+            _post.tags.set(Tag.objects.all()[i:])
+            Comment.objects.create(post=_post, author=_post.author, content="c %d" % i)
+        urls = (
+            "/api/posts/",
+            "/api/posts/?page=1&ordering=title",
+            "/api/posts/?cursor=&page_size=3",
+            "/api/posts/?fields=id,title,tags",
+            "/api/posts/?exclude=content&ordering=-comment_count",
+            "/api/posts/?excerpt=3",
+            "/api/posts/?expand=author,comments",
+            "/api/posts/?search=title",
+            "/api/comments/",
+            "/api/comments/?fields=id,post",
+            "/api/categories/?ordering=-post_count",
+            "/api/tags/",
+        )
+        for url in urls:
+            response = self.client.get(url, headers=headers)
+            self.assertEqual(response.status_code, 200, url)
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                expected = self.client.get(url, headers=headers)
+            self.assertEqual(response.content, expected.content, url)
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get("/api/posts/", headers=headers)
+        self.assertFalse(
+            [query for query in context.captured_queries if "prefetch" in query["sql"]]
+        )
+
+    @override_settings(
+        RESPONSE_CACHE_TTL=0,
+        LIST_STREAMING_MIN_PAGE_SIZE=3,
+        LIST_STREAMING_CHUNK_SIZE=2,
+    )
+    def test_list_streaming(self):
+        """
+        test large list pages are streamed with the regular content
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        headers = {"Authorization": f"Bearer {_token}"}
+        for i in range(7):
+            _post = self.post_create(_user)
+            _post.categories.set(Category.objects.all()[: i % 3])
+            _post.tags.set(Tag.objects.all()[i:])
+            Comment.objects.create(post=_post, author=_post.author, content="c %d" % i)
+
+        def get(url, streamed):
+            response = self.client.get(url, headers=headers)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.streaming, streamed, url)
+            if streamed:
+                return b"".join(response.streaming_content)
+            return response.content
+
+        _next = json.loads(get("/api/posts/?cursor=&page_size=3", True))["next"]
+        _previous = json.loads(get(_next, True))["previous"]
+        urls = (
+            "/api/posts/?page_size=3",
+            "/api/posts/?page_size=3&page=3",
+            "/api/posts/?page_size=4&ordering=title&fields=id,tags",
+            "/api/posts/?page_size=3&search=nothing",
+            "/api/posts/?cursor=&page_size=3",
+            _next,
+            _previous,
+            "/api/comments/?page_size=5",
+        )
+        for url in urls:
+            content = get(url, True)
+            with override_settings(LIST_STREAMING_MIN_PAGE_SIZE=100):
+                self.assertEqual(content, get(url, False), url)
+        self.assertEqual(len(json.loads(get(_previous, True))["results"]), 3, _previous)
+        get("/api/posts/?page_size=3&expand=author", False)
+        get("/api/posts/?page_size=2", False)
+
+    def test_keyset_lazy_page_bounds(self):
+        """
+        test rows written between the bounds and the page read are left out
+        of a lazy keyset page
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _ids = sorted((self.post_create(_user).id for _ in range(5)), reverse=True)
+        paginator = KeysetPagination()
+        paginator.page_size = 3
+        request = Request(APIRequestFactory().get("/api/posts/?cursor="))
+        page = paginator.paginate_queryset_lazily(Post.objects.all(), request)
+        self.post_create(_user)
+        self.assertEqual(list(page.values_list("id", flat=True)), _ids[:3])
+
+        request = Request(APIRequestFactory().get(paginator.get_next_link()))
+        page = paginator.paginate_queryset_lazily(Post.objects.all(), request)
+        self.assertEqual(list(page.values_list("id", flat=True)), _ids[3:])
+        request = Request(APIRequestFactory().get(paginator.get_previous_link()))
+        page = paginator.paginate_queryset_lazily(Post.objects.all(), request)
+        self.post_create(_user)
+        self.assertEqual(list(page.values_list("id", flat=True)), _ids[:3])
+
+    def test_post_list_page_size(self):
+        """
+        test list post page size chosen by the client, capped
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        headers = {"Authorization": f"Bearer {_token}"}
+        for _ in range(4):
+            self.post_create(_user)
+        response = self.client.get("/api/posts/?page_size=3", headers=headers)
+        self.assertEqual(len(response.data["results"]), 3)
+        with mock.patch.object(CreatedAtPagination, "max_page_size", 2):
+            response = self.client.get("/api/posts/?page_size=100", headers=headers)
+            self.assertEqual(len(response.data["results"]), 2)
+            response = self.client.get(
+                "/api/posts/?cursor=&page_size=100", headers=headers
+            )
+            self.assertEqual(len(response.data["results"]), 2)
+
+    def test_benchmark_serializers(self):
+        """
+        test benchmark command compares both paths and leaves no rows
+        :return:
+        """
+        stdout = StringIO()
+        call_command("benchmark_serializers", rows=5, rounds=1, stdout=stdout)
+        self.assertIn("PostSerializer: serializer", stdout.getvalue())
+        self.assertIn("CommentSerializer: serializer", stdout.getvalue())
+        self.assertFalse(Post.objects.exists())
+
+    def test_post_response_cache(self):
+        """
+        test reads are served from the cache until a rendered model changes
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        headers = {"Authorization": f"Bearer {_token}"}
+        _post = self.post_create(_user)
+        response = self.client.get("/api/posts/?page_size=3", headers=headers)
+        hits = metrics.get("response_cache.hit")
+        # the user is cached as well
+        with self.assertNumQueries(0):
+            cached = self.client.get("/api/posts/?page_size=3", headers=headers)
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached["ETag"], response["ETag"])
+        self.assertEqual(metrics.get("response_cache.hit"), hits + 1)
+        self.assertIsNotNone(metrics.ratio("response_cache.hit", "response_cache.miss"))
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                "/api/posts/?page_size=3",
+                headers={**headers, "If-None-Match": response["ETag"]},
+            )
+        self.assertEqual(response.status_code, 304)
+
+        Comment.objects.create(post=_post, author=_post.author, content="a")
+        response = self.client.get("/api/posts/?page_size=3", headers=headers)
+        self.assertEqual(response.data["results"][0]["comment_count"], 1)
+        _post.categories.add(Category.objects.get(slug="category-1"))
+        response = self.client.get(f"/api/posts/{_post.id}/", headers=headers)
+        self.assertEqual(response.data["categories"], ["category-1"])
+        self.client.get(f"/api/posts/{_post.id}/", headers=headers)
+        _user.username = "changed_local"
+        _user.email = "changed@test.local"
+        _user.save()
+        response = self.client.get(
+            f"/api/posts/{_post.id}/?expand=author", headers=headers
+        )
+        self.assertEqual(response.data["author"]["username"], "changed_local")
+
+        _other = User.objects.create_user(
+            email="other@test.local", username="other", password="T@eST1926"
+        )
+        other_headers = {"Authorization": f"Bearer {self.get_token(_other)}"}
+        response = self.client.get("/api/profile/", headers=headers)
+        self.assertEqual(response.data["user"], "changed@test.local")
+        response = self.client.get("/api/profile/", headers=other_headers)
+        self.assertEqual(response.data["user"], "other@test.local")
+
+    @override_settings(RESPONSE_CACHE_LOCK_WAIT=0.1)
+    def test_post_response_cache_single_flight(self):
+        """
+        test requests missing while another one renders get the previous
+        response, or wait for it
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        headers = {"Authorization": f"Bearer {_token}"}
+        _post = self.post_create(_user)
+        self.client.get(f"/api/posts/{_post.id}/", headers=headers)
+        _post.title = "new"
+        _post.save()
+
+        stale = metrics.get("response_cache.stale")
+        with mock.patch.object(ResponseCacheMixin, "acquire_lock", return_value=None):
+            with self.assertNumQueries(0):
+                response = self.client.get(f"/api/posts/{_post.id}/", headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content)["title"], "test")
+            self.assertEqual(metrics.get("response_cache.stale"), stale + 1)
+
+            waits = metrics.get("response_cache.lock.wait")
+            timeouts = metrics.get("response_cache.lock.timeout")
+            response = self.client.get("/api/posts/?page_size=2", headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(metrics.get("response_cache.lock.wait"), waits + 1)
+            self.assertEqual(metrics.get("response_cache.lock.timeout"), timeouts + 1)
+
+        response = self.client.get(f"/api/posts/{_post.id}/", headers=headers)
+        self.assertEqual(response.data["title"], "new")
+        cached = self.client.get(f"/api/posts/{_post.id}/", headers=headers)
+        self.assertEqual(json.loads(cached.content)["title"], "new")
+
+    def test_post_response_cache_lock_shared(self):
+        """
+        test the render lock taken through one cache client holds for another
+        client of the same cache, which then gets the entry stored by the
+        lock holder
+        :return:
+        """
+        key = RESPONSE_KEY_PREFIX + "lock"
+        result = {}
+        attempted = threading.Event()
+
+        def other_worker():
+            result["cache"] = caches["default"]
+            result["token"] = ResponseCacheMixin.acquire_lock(key)
+            attempted.set()
+            result["entry"] = ResponseCacheMixin.wait_for_entry(key, "version")
+
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": location,
+                }
+            },
+            RESPONSE_CACHE_LOCK_WAIT=5,
+        ):
+            token = ResponseCacheMixin.acquire_lock(key)
+            self.assertIsNotNone(token)
+            thread = threading.Thread(target=other_worker)
+            thread.start()
+            attempted.wait(5)
+            cache.set(key, ("version", b"{}", "application/json", {}))
+            ResponseCacheMixin.release_lock(key, token)
+            thread.join(5)
+            self.assertIsNot(result["cache"], caches["default"])
+            self.assertIsNone(result["token"])
+            self.assertEqual(result["entry"][0], "version")
+            self.assertIsNotNone(ResponseCacheMixin.acquire_lock(key))
+
     def test_post_list(self):
         """
         test list post
@@ -290,6 +1309,8 @@ class CommentTest(TestCase):
         _user_1.user_permissions.add(*_permission)
         _user_2.user_permissions.add(*_permission)
         self.client = APIClient()
+        # responses cached from rolled back test data must not leak
+        self.addCleanup(cache.clear)
 
     @staticmethod
     def get_token(user):
@@ -363,6 +1384,42 @@ class CommentTest(TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    @override_settings(RESPONSE_CACHE_TTL=0)
+    def test_post_comments(self):
+        """
+        test comments of a post are listed newest first with keyset pages
+        :return:
+        """
+        _user = User.objects.get(email="exist@test.local")
+        _token = self.get_token(_user)
+        headers = {"Authorization": f"Bearer {_token}"}
+        _post = self.post_create(_user)
+        _other = self.post_create(_user)
+        _comments = [self.comment_create(_user, _post) for _ in range(12)]
+        self.comment_create(_user, _other)
+
+        self.client.get(f"/api/posts/{_post.id}/comments/", headers=headers)
+        # post, comments
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f"/api/posts/{_post.id}/comments/", headers=headers
+            )
+        self.assertEqual(response.status_code, 200)
+        ids = [item["id"] for item in response.data["results"]]
+        response = self.client.get(response.data["next"], headers=headers)
+        ids += [item["id"] for item in response.data["results"]]
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(ids, [_comment.id for _comment in reversed(_comments)])
+
+        response = self.client.get("/api/posts/0/comments/", headers=headers)
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get("/api/posts/abc/comments/", headers=headers)
+        self.assertEqual(response.status_code, 404)
+
+        plan = Comment.objects.filter(post=_post).order_by("-created_at", "-id")
+        if connection.vendor == "sqlite":
+            self.assertIn("blog_comment_post_created_idx", plan.explain())
+
     def test_comment_delete(self):
         """
         test delete comment
@@ -393,3 +1450,134 @@ class CommentTest(TestCase):
             headers={"Authorization": f"Bearer {_token}"},
         )
         self.assertEqual(response.status_code, 403)
+
+
+class PermissionResolverTest(TestCase):
+    """
+    Permission resolver test cases
+    """
+
+    def setUp(self):
+        """
+        create user and post
+        :return:
+        """
+        self.user = User.objects.create_user(
+            email="exist@test.local",
+            username="exist_local",
+            password="T@eST1926",
+        )
+        self.group = Group.objects.create(name="editors")
+        self.user.groups.add(self.group)
+        self.group.permissions.add(Permission.objects.get(codename="change_post"))
+        self.user.user_permissions.add(Permission.objects.get(codename="add_post"))
+        _profile = Profile.objects.create(bio="test", user=self.user)
+        self.posts = [
+            Post.objects.create(title="test", content="test", author=_profile)
+            for _ in range(3)
+        ]
+
+    def test_model_permissions_cached(self):
+        """
+        test model permissions are cached across resolvers and invalidated
+        :return:
+        """
+        get_model_permissions(self.user)
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                PermissionResolver(self.user).has_perms(
+                    ["blog.add_post", "blog.change_post"]
+                )
+            )
+        self.group.permissions.clear()
+        self.assertFalse(PermissionResolver(self.user).has_perms(["blog.change_post"]))
+        self.user.user_permissions.clear()
+        self.assertFalse(PermissionResolver(self.user).has_perms(["blog.add_post"]))
+
+    def test_object_permissions_prefetch(self):
+        """
+        test object permissions of a page are loaded with one query
+        :return:
+        """
+        assign_perm("delete_post", self.user, self.posts[0])
+        assign_perm("change_post", self.group, self.posts[1])
+        resolver = PermissionResolver(self.user)
+        with self.assertNumQueries(1):
+            resolver.prefetch(self.posts)
+            self.assertTrue(resolver.has_perms(["blog.delete_post"], self.posts[0]))
+            self.assertFalse(resolver.has_perms(["blog.change_post"], self.posts[0]))
+            self.assertTrue(resolver.has_perms(["blog.change_post"], self.posts[1]))
+            self.assertFalse(resolver.has_perms(["blog.delete_post"], self.posts[2]))
+            self.assertFalse(resolver.has_perms(["blog.delete_comment"], self.posts[0]))
+            self.assertFalse(resolver.has_perms(["blog.delete_post"], Post()))
+
+    def test_model_permissions_invalidated_on_commit(self):
+        """
+        test permissions cached again before the commit are invalidated by it
+        :return:
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.clear()
+            # a concurrent request still seeing the previous grants
+            cache.set(
+                get_model_permissions_key(self.user.pk),
+                frozenset(["blog.add_post"]),
+            )
+        self.assertFalse(PermissionResolver(self.user).has_perms(["blog.add_post"]))
+
+
+class FastJSONTest(TestCase):
+    """
+    orjson renderer and parser test cases
+    """
+
+    def test_renderer_matches_json_renderer(self):
+        """
+        test orjson renders post pages and edge values like JSONRenderer
+        :return:
+        """
+        page = BenchmarkJSONCommand.build_page(20)
+        page["results"][0]["title"] = 'line\u2028para\u2029 \x00\x1f\x7f "q" é 😀'
+        for data in (
+            page,
+            {"when": timezone.now(), "amount": Decimal("1.10"), 1: uuid.uuid4()},
+            {"big": 2**70, "lazy": gettext_lazy("text")},
+            [],
+            None,
+        ):
+            self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            ORJSONRenderer().render({"a": 1}, "application/json; indent=2"),
+            b'{\n  "a": 1\n}',
+        )
+
+    def test_parser_matches_json_parser(self):
+        """
+        test orjson parses like JSONParser, errors included
+        :return:
+        """
+        for body in (
+            '{"title": "é\u2028", "tags": ["a"]}'.encode(),
+            b'{"id": 123456789012345678901234567890}',
+            b"[1e400]",
+            b"NaN",
+            b"{bad",
+            b"",
+        ):
+            try:
+                expected = JSONParser().parse(BytesIO(body))
+            except ParseError as error:
+                with self.assertRaisesMessage(ParseError, str(error)):
+                    ORJSONParser().parse(BytesIO(body))
+            else:
+                self.assertEqual(ORJSONParser().parse(BytesIO(body)), expected)
+
+    def test_benchmark_json(self):
+        """
+        test benchmark command compares both renderers
+        :return:
+        """
+        stdout = StringIO()
+        call_command("benchmark_json", page_size=5, rounds=1, stdout=stdout)
+        self.assertIn("render: json", stdout.getvalue())
+        self.assertIn("parse: json", stdout.getvalue())
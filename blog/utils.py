@@ -0,0 +1,81 @@
+"""
+Blog utils
+"""
+
+from operator import attrgetter
+
+from .cache import bump_model_generation
+
+BULK_BATCH_SIZE = 500
+
+
+def bulk_set_related(model, field_name, assignments, replace=False):
+    """
+    Write many-to-many rows for several instances with one bulk insert.
+
+    Unlike the related manager ``set()``/``add()`` this does not send
+    m2m_changed signals, the cached responses of model are invalidated here.
+    :param model: model declaring the many-to-many field
+    :param field_name: name of the many-to-many field
+    :param assignments: mapping of instance pk to the related objects
+    :param replace: remove the existing rows that are not assigned anymore
+    :return: (added, removed) lists of (source pk, target pk) pairs
+    """
+    field = model._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = "%s_id" % field.m2m_field_name()
+    target = "%s_id" % field.m2m_reverse_field_name()
+    wanted = {
+        (source_id, related.pk)
+        for source_id, objects in assignments.items()
+        for related in objects
+    }
+
+    existing = set()
+    removed = []
+    if replace and assignments:
+        existing = set(
+            through.objects.filter(**{"%s__in" % source: list(assignments)})
+            .values_list(source, target)
+            .iterator()
+        )
+        stale = {}
+        removed = sorted(existing - wanted)
+        for source_id, target_id in removed:
+            stale.setdefault(source_id, []).append(target_id)
+        for source_id, target_ids in stale.items():
+            through.objects.filter(
+                **{source: source_id, "%s__in" % target: target_ids}
+            ).delete()
+
+    missing = sorted(wanted - existing)
+    if missing:
+        through.objects.bulk_create(
+            [through(**{source: s, target: t}) for s, t in missing],
+            batch_size=BULK_BATCH_SIZE,
+        )
+    if missing or removed:
+        bump_model_generation(model)
+    return missing, removed
+
+
+def cache_related(instance, field_name, objects):
+    """
+    Store related objects in the prefetch cache of instance, like
+    prefetch_related does, so rendering them needs no query
+    :param instance:
+    :param field_name:
+    :param objects:
+    :return:
+    """
+    queryset = getattr(instance, field_name).all()
+    objects = list(objects)
+    for ordering in reversed(queryset.model._meta.ordering):
+        objects.sort(
+            key=attrgetter(ordering.lstrip("-")), reverse=ordering.startswith("-")
+        )
+    queryset._result_cache = objects
+    queryset._prefetch_done = True
+    if not hasattr(instance, "_prefetched_objects_cache"):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[field_name] = queryset
@@ -2,12 +2,34 @@
 Blog views
 """
 
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+from django.http import Http404
+from django_filters.rest_framework import DjangoFilterBackend
 from guardian.shortcuts import assign_perm
-from rest_framework.generics import RetrieveUpdateAPIView
+from guardian.utils import get_user_obj_perms_model
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.filters import OrderingFilter
+from rest_framework.generics import RetrieveUpdateAPIView, get_object_or_404
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.permissions import DjangoObjectPermissions
+from rest_framework.response import Response
 
+from .conditional import ConditionalGetMixin
+from .fastpath import FastListMixin
 from .models import Category, Tag, Post, Profile, Comment
+from .pagination import CreatedAtPagination, KeysetPagination
+from .permissions import CachedDjangoObjectPermissions
+from .responsecache import ResponseCacheMixin
+from .search import FullTextSearchFilter
+from .sparse import SparseFieldsMixin, get_expansions
+from .streaming import StreamingListMixin
+from .taxonomy import get_snapshot
+from .utils import BULK_BATCH_SIZE
 from .serializers import (
     CategorySerializer,
     TagSerializer,
@@ -17,25 +39,95 @@ from .serializers import (
 )
 
 
-class CategoryViewSet(ModelViewSet):
+class TaxonomySnapshotMixin:
+    """
+    Serve list, retrieve and slug filtering from the taxonomy snapshot
+    """
+
+    ordering_fields = ("name", "post_count", "created_at")
+
+    def get_snapshot_objects(self):
+        """
+        Get snapshot objects filtered on the slug query param and sorted on
+        the ordering query param
+        :return:
+        """
+        slug = self.request.query_params.get("slug") or None
+        objects = get_snapshot().filter(self.queryset.model, slug=slug)
+        ordering = self.request.query_params.get(OrderingFilter.ordering_param)
+        if ordering and ordering.lstrip("-") in self.ordering_fields:
+            objects.sort(
+                key=lambda obj: getattr(obj, ordering.lstrip("-")),
+                reverse=ordering.startswith("-"),
+            )
+        return objects
+
+    def get_object(self):
+        """
+        Get object from the snapshot
+        :return:
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            _id = int(self.kwargs[lookup_url_kwarg])
+        except (TypeError, ValueError):
+            raise Http404
+        _object = get_snapshot().get(self.queryset.model, _id)
+        if _object is None:
+            raise Http404
+        self.check_object_permissions(self.request, _object)
+        return _object
+
+    def filter_queryset(self, queryset):
+        """
+        Filter queryset, list views get snapshot objects
+        :param queryset:
+        :return:
+        """
+        return self.get_snapshot_objects()
+
+    def get_list_validators(self):
+        """
+        Get (etag, last_modified) of the list from the snapshot
+        :return:
+        """
+        objects = self.get_snapshot_objects()
+        return self.make_etag(get_snapshot().version, len(objects)), None
+
+
+class CategoryViewSet(
+    ResponseCacheMixin,
+    TaxonomySnapshotMixin,
+    ConditionalGetMixin,
+    FastListMixin,
+    ModelViewSet,
+):
     """
     List retrieve category view
     """
 
     serializer_class = CategorySerializer
     queryset = Category.objects.all()
+    cache_models = (Category,)
     filterset_fields = ("slug",)
     lookup_field = "id"
     http_method_names = ["get"]
 
 
-class TagViewSet(ModelViewSet):
+class TagViewSet(
+    ResponseCacheMixin,
+    TaxonomySnapshotMixin,
+    ConditionalGetMixin,
+    FastListMixin,
+    ModelViewSet,
+):
     """
     List retrieve tag view
     """
 
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
+    cache_models = (Tag,)
     filterset_fields = ("slug",)
     lookup_field = "id"
     http_method_names = ["get"]
@@ -62,53 +154,250 @@ class WithPermissionsMixin:
             raise AttributeError("WithPermissionsViewSet must have a request attribute")
         super().__init__(*args, **kwargs)
 
+    def get_permission_codenames(self):
+        """
+        Get codenames of the permissions granted on created objects
+        :return:
+        """
+        return [
+            "change_%s" % self.model.__name__.lower(),
+            "delete_%s" % self.model.__name__.lower(),
+        ]
+
     def assign_permissions(self, _object):
         """
         Assign permissions to object
         :param _object:
         :return:
         """
-        assign_perm(
-            "change_%s" % self.model.__name__.lower(), self.request.user, _object
-        )
-        assign_perm(
-            "delete_%s" % self.model.__name__.lower(), self.request.user, _object
+        for codename in self.get_permission_codenames():
+            assign_perm(codename, self.request.user, _object)
+
+    def assign_permissions_bulk(self, objects):
+        """
+        Assign permissions to many new objects with one bulk insert
+        :param objects:
+        :return:
+        """
+        perm_model = get_user_obj_perms_model(self.model)
+        content_type = ContentType.objects.get_for_model(self.model)
+        permissions = list(
+            Permission.objects.filter(
+                content_type=content_type, codename__in=self.get_permission_codenames()
+            )
         )
+        rows = []
+        for _object in objects:
+            for permission in permissions:
+                kwargs = {"permission": permission, "user": self.request.user}
+                if perm_model.objects.is_generic():
+                    kwargs.update(content_type=content_type, object_pk=_object.pk)
+                else:
+                    kwargs["content_object"] = _object
+                rows.append(perm_model(**kwargs))
+        perm_model.objects.bulk_create(rows, batch_size=BULK_BATCH_SIZE)
+
+
+class AuthorMixin:
+    """
+    Author mixin
+    """
 
+    request = None
 
-class PostViewSet(ModelViewSet, WithPermissionsMixin):
+    def get_author_id(self):
+        """
+        Get profile id of the request user, from the profile_id token claim
+        or with one query memoized for the request
+        :return:
+        """
+        request = self.request
+        if getattr(request, "_author_id", None) is None:
+            claims = request.auth if hasattr(request.auth, "get") else {}
+            author_id = claims.get("profile_id")
+            if author_id is None:
+                author_id = (
+                    Profile.objects.filter(user=request.user)
+                    .values_list("id", flat=True)
+                    .first()
+                )
+            if author_id is None:
+                # users created before profiles were created eagerly
+                author_id = Profile.objects.get_or_create(user=request.user)[0].pk
+            request._author_id = author_id
+        return request._author_id
+
+
+class PostViewSet(
+    ResponseCacheMixin,
+    ConditionalGetMixin,
+    StreamingListMixin,
+    FastListMixin,
+    SparseFieldsMixin,
+    ModelViewSet,
+    WithPermissionsMixin,
+    AuthorMixin,
+):
     """
     List, Retrieve, Update, Destroy and Create post view
     """
 
-    permission_classes = (DjangoObjectPermissions,)
+    permission_classes = (CachedDjangoObjectPermissions,)
     serializer_class = PostSerializer
     queryset = Post.objects.all()
+    prefetches = {
+        "categories": Category.objects.only("id", "slug"),
+        "tags": Tag.objects.only("id", "slug"),
+    }
     model = Post
+    cache_models = (Post, Comment, Category, Tag, Profile)
+    pagination_class = CreatedAtPagination
+    filter_backends = (DjangoFilterBackend, OrderingFilter, FullTextSearchFilter)
     search_fields = ("title", "content")
+    ordering_fields = ("created_at", "updated_at", "title", "comment_count")
     lookup_field = "id"
 
+    def get_etag_dependencies(self):
+        """
+        Posts render category and tag slugs, which change without the post
+        :return:
+        """
+        return (get_snapshot().version,)
+
+    def get_expansions(self):
+        """
+        Get the expansions asked for by the expand query param
+        :return:
+        """
+        return get_expansions(self.request, self.serializer_class.expandable)
+
+    def is_conditional(self):
+        """
+        Expanded posts embed rows the validators do not cover
+        :return:
+        """
+        return super().is_conditional() and not self.get_expansions()
+
+    def get_prefetch(self, name):
+        """
+        Get prefetch, full categories and tags when expanded and the latest
+        comments of every post of the page in one query
+        :param name:
+        :return:
+        """
+        if name == "latest_comments":
+            comments = Comment.objects.annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=F("post_id"),
+                    order_by=(F("created_at").desc(), F("id").desc()),
+                )
+            ).filter(position__lte=settings.POST_EXPAND_COMMENTS)
+            return Prefetch("post_comments", queryset=comments, to_attr=name)
+        if name in ("categories", "tags") and name in self.get_expansions():
+            model = self.model._meta.get_field(name).related_model
+            return Prefetch(name, queryset=model.objects.all())
+        return super().get_prefetch(name)
+
+    def get_queryset(self):
+        """
+        Get queryset, joining the author profile when expanded
+        :return:
+        """
+        queryset = super().get_queryset()
+        if "author" in self.get_expansions():
+            queryset = queryset.select_related("author__user")
+        return queryset
+
     def perform_create(self, serializer):
         """
         Override perform_create method for post creation
         :param serializer:
         :return:
         """
-        _user = self.request.user
-        author, _ = Profile.objects.get_or_create(user=_user)
-        _object = serializer.save(author=author)
+        _object = serializer.save(author_id=self.get_author_id())
         self.assign_permissions(_object)
 
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="comments",
+        serializer_class=CommentSerializer,
+        pagination_class=KeysetPagination,
+    )
+    def comments(self, request, *args, **kwargs):
+        """
+        List comments of a post, newest first, with keyset pagination on the
+        (post, created_at, id) index
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+
+        def render():
+            _post = get_object_or_404(
+                Post.objects.only("id"),
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+            self.check_object_permissions(request, _post)
+            page = self.paginate_queryset(Comment.objects.filter(post=_post))
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        return self.cached_response(render)
 
-class CommentViewSet(ModelViewSet, WithPermissionsMixin):
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request, *args, **kwargs):
+        """
+        Create many posts from a list in one transaction
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=settings.POST_BULK_MAX_SIZE,
+        )
+        serializer.is_valid(raise_exception=True)
+        self.perform_bulk_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def perform_bulk_create(self, serializer):
+        """
+        Bulk create posts and grant their permissions
+        :param serializer:
+        :return:
+        """
+        with transaction.atomic():
+            objects = serializer.save(author_id=self.get_author_id())
+            self.assign_permissions_bulk(objects)
+
+
+class CommentViewSet(
+    ResponseCacheMixin,
+    ConditionalGetMixin,
+    StreamingListMixin,
+    FastListMixin,
+    SparseFieldsMixin,
+    ModelViewSet,
+    WithPermissionsMixin,
+    AuthorMixin,
+):
     """
     List, Retrieve, Update, Destroy and Create comment view
     """
 
-    permission_classes = (DjangoObjectPermissions,)
+    permission_classes = (CachedDjangoObjectPermissions,)
     serializer_class = CommentSerializer
     queryset = Comment.objects.all()
     model = Comment
+    cache_models = (Comment,)
+    pagination_class = CreatedAtPagination
     lookup_field = "id"
     http_method_names = ["get", "post", "delete"]
 
@@ -118,21 +407,27 @@ class CommentViewSet(ModelViewSet, WithPermissionsMixin):
         :param serializer:
         :return:
         """
-        _user = self.request.user
-        author, _ = Profile.objects.get_or_create(user=_user)
-        _object = serializer.save(author=author)
+        _object = serializer.save(author_id=self.get_author_id())
         self.assign_permissions(_object)
 
 
-class ProfileViewSet(RetrieveUpdateAPIView, WithPermissionsMixin):
+class ProfileViewSet(ResponseCacheMixin, RetrieveUpdateAPIView, WithPermissionsMixin):
     """
     Retrieve, Update profile view
     """
 
-    permission_classes = (DjangoObjectPermissions,)
+    permission_classes = (CachedDjangoObjectPermissions,)
     serializer_class = ProfileSerializer
     queryset = Profile.objects.all()
     model = Profile
+    cache_models = (Profile,)
+
+    def get_cache_scope(self):
+        """
+        The profile is the one of the request user
+        :return:
+        """
+        return self.request.user.pk
 
     def get_object(self):
         """
@@ -140,5 +435,8 @@ class ProfileViewSet(RetrieveUpdateAPIView, WithPermissionsMixin):
         :return:
         """
         _user = self.request.user
-        profile, _ = Profile.objects.get_or_create(user=_user)
+        profile = Profile.objects.filter(user=_user).first()
+        if profile is None:
+            # users created before profiles were created eagerly
+            profile, _ = Profile.objects.get_or_create(user=_user)
         return profile
@@ -0,0 +1,121 @@
+"""
+orjson renderer and parser.
+
+Drop-in replacements for DRF's JSONRenderer and JSONParser that encode and
+decode with orjson, enabled with FAST_JSON=1. The output is the same as
+JSONRenderer's, byte for byte: compact separators, UTF-8 without escaping,
+\\u2028 and \\u2029 escaped, and DRF's JSONEncoder for the types orjson does
+not encode the same way (datetimes, decimals, lazy strings, ...). Indented
+renders, integers wider than 64 bits and bodies that are not UTF-8 go
+through the stdlib json path unchanged. Floats are the exception, the API
+has none: exponents are written the orjson way (1e16 instead of 1e+16) and
+NaN and Infinity render as null instead of failing.
+"""
+
+import io
+
+import orjson
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+# orjson decodes integers wider than 64 bits as floats (or rejects them,
+# depending on the version), values holding such floats are decoded again
+# with json
+WIDE_FLOAT = float(2**63)
+LINE_SEPARATORS = (
+    ("\u2028".encode(), b"\\u2028"),
+    ("\u2029".encode(), b"\\u2029"),
+)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson
+    """
+
+    def get_options(self):
+        """
+        Get orjson options matching the JSONRenderer settings, None when
+        orjson cannot match them
+        :return:
+        """
+        if self.ensure_ascii or not self.compact:
+            return None
+        return orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render data into JSON
+        :param data:
+        :param accepted_media_type:
+        :param renderer_context:
+        :return:
+        """
+        options = self.get_options()
+        if (
+            data is None
+            or options is None
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=options
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in ret:
+                ret = ret.replace(separator, escaped)
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser decoding with orjson
+    """
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """
+        Parse the incoming JSON bytestream
+        :param stream:
+        :param media_type:
+        :param parser_context:
+        :return:
+        """
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            data = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            data = None
+        else:
+            if not has_wide_float(data):
+                return data
+        # let JSONParser decode what orjson may not, and word the errors
+        return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+def has_wide_float(data):
+    """
+    Whether decoded data holds a float an integer wider than 64 bits may
+    have been decoded to
+    :param data:
+    :return:
+    """
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif isinstance(value, float) and abs(value) >= WIDE_FLOAT:
+            return True
+    return False
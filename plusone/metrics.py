@@ -0,0 +1,56 @@
+"""
+In-process metrics counters.
+
+Counters are per worker process, collect them from every worker to get the
+totals of a deployment.
+"""
+
+import threading
+from collections import Counter
+
+_COUNTERS = Counter()
+_LOCK = threading.Lock()
+
+
+def incr(name, value=1):
+    """
+    Increment counter name
+    :param name:
+    :param value:
+    :return:
+    """
+    with _LOCK:
+        _COUNTERS[name] += value
+
+
+def get(name):
+    """
+    Get value of counter name
+    :param name:
+    :return:
+    """
+    return _COUNTERS[name]
+
+
+def snapshot(prefix=""):
+    """
+    Get counters starting with prefix
+    :param prefix:
+    :return:
+    """
+    with _LOCK:
+        return {
+            name: value for name, value in _COUNTERS.items() if name.startswith(prefix)
+        }
+
+
+def ratio(hits, misses):
+    """
+    Get the hit ratio of two counters, None before the first lookup
+    :param hits: name of the hit counter
+    :param misses: name of the miss counter
+    :return:
+    """
+    with _LOCK:
+        total = _COUNTERS[hits] + _COUNTERS[misses]
+        return _COUNTERS[hits] / total if total else None
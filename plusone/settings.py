@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 import os
+import sys
 from dotenv import load_dotenv
 from datetime import timedelta
 from pathlib import Path
@@ -102,6 +103,35 @@ DATABASES = {
     }
 }
 
+# The test suite runs in a single process, with no redis
+TESTING = sys.argv[1:2] == ["test"]
+
+# Cache shared by every worker, the redis service of docker-compose, through
+# which a write in one worker invalidates what all of them cached
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            (
+                "django.core.cache.backends.locmem.LocMemCache"
+                if TESTING
+                else "django.core.cache.backends.redis.RedisCache"
+            ),
+        ),
+        "LOCATION": os.getenv(
+            "CACHE_LOCATION", "" if TESTING else "redis://127.0.0.1:6379/0"
+        ),
+    }
+}
+
+# Whether every process serving requests uses the same cache. A LocMemCache
+# is private to its process, the caches a write in another worker must
+# invalidate are then disabled by default
+SHARED_CACHE = (
+    TESTING
+    or CACHES["default"]["BACKEND"] != "django.core.cache.backends.locmem.LocMemCache"
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -143,16 +173,16 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Auth
 AUTHENTICATION_BACKENDS = (
-    "django.contrib.auth.backends.ModelBackend",
+    "user.backends.PooledModelBackend",
     "guardian.backends.ObjectPermissionBackend",
 )
 
 # Rest Framework
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.BasicAuthentication",
+        "user.authentication.CachedBasicAuthentication",
         "rest_framework.authentication.SessionAuthentication",
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
@@ -163,18 +193,108 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 10,
 }
 
+# Render and parse JSON with orjson (see plusone.fastjson), 1 enables it
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1"
+if FAST_JSON:
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = (
+        "plusone.fastjson.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    )
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"] = (
+        "plusone.fastjson.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    )
+
 # JWT
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=10),
-    "UPDATE_LAST_LOGIN": True,
+    # last_login is written by user.lastlogin, see LAST_LOGIN_FLUSH_INTERVAL
+    "UPDATE_LAST_LOGIN": False,
     "ALGORITHM": "HS256",
     "SIGNING_KEY": SECRET_KEY,
     "AUTH_HEADER_TYPES": ("Bearer",),
     "AUTH_HEADER_NAME": "HTTP_AUTHORIZATION",
     "USER_ID_FIELD": "id",
     "USER_ID_CLAIM": "user_id",
+    "TOKEN_OBTAIN_SERIALIZER": "user.serializers.TokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "user.serializers.TokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "user.serializers.TokenVerifySerializer",
+    "TOKEN_BLACKLIST_SERIALIZER": "user.serializers.TokenBlacklistSerializer",
 }
 
 # Default User group permissions
 DEFAULT_USER_GROUP = "default"
+
+# Seconds a worker may serve its taxonomy snapshot without reloading it,
+# bounds staleness when the cache is not shared between workers
+TAXONOMY_SNAPSHOT_MAX_AGE = 300
+
+# Build list responses from values() rows instead of model instances when
+# the serializer allows it (see blog.fastpath)
+FAST_LIST_SERIALIZATION = True
+
+# Largest page size clients may ask for with the page_size query param
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+# Post and comment list pages of at least this many rows are streamed (see
+# blog.streaming), loading and encoding LIST_STREAMING_CHUNK_SIZE rows at a time
+LIST_STREAMING_MIN_PAGE_SIZE = 100
+LIST_STREAMING_CHUNK_SIZE = 100
+
+# Maximum number of posts accepted by one bulk create request
+POST_BULK_MAX_SIZE = 1000
+
+# Number of latest comments embedded in each post by ?expand=comments
+POST_EXPAND_COMMENTS = 5
+
+# Seconds a rendered read response is cached, 0 disables the response cache.
+# Writes invalidate it, the timeout only bounds the memory used
+RESPONSE_CACHE_TTL = int(
+    os.getenv("RESPONSE_CACHE_TTL", "300" if SHARED_CACHE else "0")
+)
+
+# Seconds a request rendering a missed response holds its lock at most, and
+# seconds other requests wait for it when there is no previous response to
+# serve in the meantime, a wait that blocks their worker
+RESPONSE_CACHE_LOCK_TIMEOUT = int(os.getenv("RESPONSE_CACHE_LOCK_TIMEOUT", "10"))
+RESPONSE_CACHE_LOCK_WAIT = float(os.getenv("RESPONSE_CACHE_LOCK_WAIT", "0.5"))
+
+# Answer unchanged reads with 304 from ETags built on the model generations
+# kept in the cache (see blog.conditional)
+CONDITIONAL_GET = SHARED_CACHE
+
+# Seconds the model permissions of a user are cached across requests
+PERMISSION_CACHE_TTL = 300 if SHARED_CACHE else 0
+
+# Seconds an authenticated user is served from the cache
+AUTH_USER_CACHE_TTL = 60 if SHARED_CACHE else 0
+
+# Seconds a verified Basic auth credential is remembered, 0 disables it
+BASIC_AUTH_CACHE_TTL = int(os.getenv("BASIC_AUTH_CACHE_TTL", "0"))
+
+# Seconds a worker may answer token blacklist checks from memory without
+# looking for new blacklisted tokens announced through the cache, every check
+# looks for them when the cache is not shared
+TOKEN_DENYLIST_MAX_AGE = 60 if SHARED_CACHE else 0
+
+# Seconds between full reloads of the token blacklist in every worker, which
+# catch rows committed out of id order past the incremental rescan window
+TOKEN_DENYLIST_REBUILD_INTERVAL = 3600
+
+# Seconds token obtain logins are buffered before last_login is written in
+# one bulk update, 0 writes every login inline
+LAST_LOGIN_FLUSH_INTERVAL = int(os.getenv("LAST_LOGIN_FLUSH_INTERVAL", "10"))
+
+# Number of buffered logins that triggers an immediate flush
+LAST_LOGIN_MAX_PENDING = 1000
+
+# Processes hashing and verifying passwords off the request workers,
+# 0 hashes inline
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", "2"))
+
+# Password operations queued or running at once, and seconds a request
+# waits for a slot before answering 503
+PASSWORD_HASHING_CONCURRENCY = int(os.getenv("PASSWORD_HASHING_CONCURRENCY", "16"))
+PASSWORD_HASHING_TIMEOUT = 5
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "user"
+
+    def ready(self):
+        """
+        Connect signals
+        :return:
+        """
+        from . import (  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
+            signals,
+        )
@@ -0,0 +1,168 @@
+"""
+user authentication
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils.crypto import salted_hmac
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from plusone import metrics
+
+User = get_user_model()
+
+USER_CACHE_KEY = "user:auth:%s"
+BASIC_AUTH_CACHE_KEY = "user:basic:%s"
+# fields of a cached user, the others are deferred and read from the
+# database when accessed, the password in particular is never cached
+USER_CACHE_FIELDS = ("id", "email", "username", "is_active", "is_staff", "is_superuser")
+
+
+def get_cached_user(user_id):
+    """
+    get user by id from the cache, loading it on a miss. The user carries
+    password_md5, the hash its tokens are revoked with, in place of its
+    password
+    :param user_id:
+    :return: user object or None
+    """
+    key = USER_CACHE_KEY % user_id
+    entry = cache.get(key)
+    if entry is None:
+        _user = (
+            User.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+            .only(*USER_CACHE_FIELDS, "password")
+            .first()
+        )
+        if _user is None:
+            return None
+        entry = (
+            {name: getattr(_user, name) for name in USER_CACHE_FIELDS},
+            get_md5_hash_password(_user.password),
+        )
+        cache.set(key, entry, settings.AUTH_USER_CACHE_TTL)
+    values, password_md5 = entry
+    # from_db takes the loaded values in field order
+    names = [
+        field.attname for field in User._meta.concrete_fields if field.attname in values
+    ]
+    _user = User.from_db(
+        router.db_for_read(User), names, [values[name] for name in names]
+    )
+    _user.password_md5 = password_md5
+    return _user
+
+
+def invalidate_cached_user(user_id, using=None):
+    """
+    remove a user from the cache, now and once the current transaction
+    commits, so a user read by a concurrent request before the commit is
+    not cached again
+    :param user_id:
+    :param using:
+    :return:
+    """
+
+    def delete():
+        cache.delete(USER_CACHE_KEY % user_id)
+
+    delete()
+    transaction.on_commit(delete, using=using)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication serving users from a short lived cache
+    """
+
+    def get_user(self, validated_token):
+        """
+        get user of a validated token
+        :param validated_token:
+        :return: user object
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if (
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM)
+                != user.password_md5
+            ):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    Basic authentication remembering verified credentials.
+
+    Enabled when BASIC_AUTH_CACHE_TTL is set. Successful verifications are
+    cached under a salted HMAC of the credentials, next to a digest of the
+    user password hash, so changing the password (ChangePasswordView or any
+    other save) invalidates the entry. Hits and misses are counted in the
+    basic_auth.cache.hit and basic_auth.cache.miss metrics.
+    """
+
+    @staticmethod
+    def digest(value):
+        """
+        salted digest of value
+        :param value:
+        :return:
+        """
+        return salted_hmac(
+            "user.authentication.CachedBasicAuthentication", value, algorithm="sha256"
+        ).hexdigest()
+
+    def authenticate_credentials(self, userid, password, request=None):
+        """
+        authenticate credentials, from the cache when verified recently
+        :param userid:
+        :param password:
+        :param request:
+        :return: (user, None)
+        """
+        ttl = settings.BASIC_AUTH_CACHE_TTL
+        if not ttl:
+            return super().authenticate_credentials(userid, password, request)
+
+        key = BASIC_AUTH_CACHE_KEY % self.digest("%s\0%s" % (userid, password))
+        entry = cache.get(key)
+        if entry is not None:
+            user_id, password_digest = entry
+            user = get_cached_user(user_id)
+            if (
+                user is not None
+                and user.is_active
+                and password_digest == self.digest(user.password_md5)
+            ):
+                metrics.incr("basic_auth.cache.hit")
+                return user, None
+            cache.delete(key)
+
+        metrics.incr("basic_auth.cache.miss")
+        user, auth = super().authenticate_credentials(userid, password, request)
+        password_md5 = get_md5_hash_password(user.password)
+        cache.set(key, (user.pk, self.digest(password_md5)), ttl)
+        return user, auth
@@ -0,0 +1,39 @@
+"""
+user authentication backends
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from . import hashing
+
+User = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend verifying passwords in the password hashing pool
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        """
+        authenticate credentials
+        :param request:
+        :param username:
+        :param password:
+        :param kwargs:
+        :return: user object or None
+        """
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            # hash once anyway, so unknown users take as long as known ones
+            hashing.make_password(password)
+            return None
+        if hashing.check_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
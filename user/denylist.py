@@ -0,0 +1,187 @@
+"""
+user token denylist
+
+Keeps the JTIs of blacklisted refresh tokens in process memory, so checking
+a token does not join OutstandingToken and BlacklistedToken on every
+refresh, verify or blacklist request. The set is loaded on first use and
+then extended incrementally with the rows added since the last load, when
+another process announces a new entry through the cache or when
+TOKEN_DENYLIST_MAX_AGE elapses. Negative lookups are answered from memory.
+
+Rows of concurrent transactions commit out of id order, so an incremental
+load scans again the last DENYLIST_RESCAN_IDS ids it already went past, and
+the whole set is rebuilt every TOKEN_DENYLIST_REBUILD_INTERVAL seconds to
+catch rows committed later still.
+"""
+
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from plusone import metrics
+
+DENYLIST_VERSION_KEY = "user:denylist:version"
+DENYLIST_REBUILD_KEY = "user:denylist:rebuild"
+DENYLIST_CHUNK_SIZE = 2000
+DENYLIST_RESCAN_IDS = 1000
+
+
+class TokenDenylist:
+    """
+    Exact in-memory set of blacklisted JTIs
+    """
+
+    def __init__(self):
+        """
+        Initialize
+        """
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """
+        forget every JTI, the next lookup reloads the set
+        :return:
+        """
+        self.jtis = set()
+        self.last_id = 0
+        self.version = None
+        self.rebuild = None
+        self.loaded_at = None
+        self.built_at = None
+
+    def is_stale(self, version, rebuild):
+        """
+        whether the set misses rows added since it was loaded
+        :param version:
+        :param rebuild:
+        :return:
+        """
+        if self.loaded_at is None or version != self.version:
+            return True
+        if rebuild != self.rebuild:
+            return True
+        return time.monotonic() - self.loaded_at >= settings.TOKEN_DENYLIST_MAX_AGE
+
+    def needs_rebuild(self, rebuild):
+        """
+        whether the set must be loaded from scratch
+        :param rebuild:
+        :return:
+        """
+        return (
+            self.built_at is None
+            or rebuild != self.rebuild
+            or time.monotonic() - self.built_at
+            >= settings.TOKEN_DENYLIST_REBUILD_INTERVAL
+        )
+
+    def load(self):
+        """
+        load blacklisted JTIs added since the last load, every JTI when the
+        set was never loaded, a rebuild was requested or is due
+        :return:
+        """
+        tokens = cache.get_many([DENYLIST_VERSION_KEY, DENYLIST_REBUILD_KEY])
+        version = tokens.get(DENYLIST_VERSION_KEY)
+        rebuild = tokens.get(DENYLIST_REBUILD_KEY)
+        if not self.is_stale(version, rebuild):
+            return
+        with self.lock:
+            if not self.is_stale(version, rebuild):
+                return
+            full = self.needs_rebuild(rebuild)
+            if full:
+                jtis, last_id = set(), 0
+                metrics.incr("token_denylist.rebuild")
+            else:
+                # rows below last_id may have committed since the last load
+                jtis = self.jtis
+                last_id = max(self.last_id - DENYLIST_RESCAN_IDS, 0)
+            while True:
+                rows = list(
+                    BlacklistedToken.objects.filter(id__gt=last_id)
+                    .order_by("id")
+                    .values_list("id", "token__jti")[:DENYLIST_CHUNK_SIZE]
+                )
+                for last_id, jti in rows:
+                    jtis.add(jti)
+                if len(rows) < DENYLIST_CHUNK_SIZE:
+                    break
+            self.jtis = jtis
+            self.last_id = last_id if full else max(last_id, self.last_id)
+            self.version = version
+            self.rebuild = rebuild
+            self.loaded_at = time.monotonic()
+            if full:
+                self.built_at = self.loaded_at
+
+    def add(self, jti):
+        """
+        add a JTI blacklisted by this process
+        :param jti:
+        :return:
+        """
+        self.jtis.add(jti)
+
+    def __contains__(self, jti):
+        """
+        whether a JTI is blacklisted
+        :param jti:
+        :return:
+        """
+        self.load()
+        return jti in self.jtis
+
+    def __len__(self):
+        """
+        number of known blacklisted JTIs
+        :return:
+        """
+        return len(self.jtis)
+
+
+denylist = TokenDenylist()
+
+
+def is_blacklisted(jti):
+    """
+    whether a token JTI is blacklisted
+    :param jti:
+    :return:
+    """
+    if jti in denylist:
+        metrics.incr("token_denylist.hit")
+        return True
+    metrics.incr("token_denylist.miss")
+    return False
+
+
+def announce_blacklisted(jti, using=None):
+    """
+    add a JTI to the local set and tell other processes to load new rows
+    :param jti:
+    :param using:
+    :return:
+    """
+    denylist.add(jti)
+
+    def bump():
+        cache.set(DENYLIST_VERSION_KEY, uuid.uuid4().hex, None)
+
+    bump()
+    transaction.on_commit(bump, using=using)
+
+
+def request_rebuild():
+    """
+    make every process reload its set from scratch, after rows were pruned
+    :return:
+    """
+    cache.set(DENYLIST_REBUILD_KEY, uuid.uuid4().hex, None)
+    denylist.clear()
@@ -0,0 +1,180 @@
+"""
+user password hashing
+
+PBKDF2 hashing and verification run in a bounded process pool, so a burst
+of registrations or logins keeps PASSWORD_HASHING_WORKERS cores busy
+instead of every request worker. At most PASSWORD_HASHING_CONCURRENCY
+operations are queued or running at once; callers wait up to
+PASSWORD_HASHING_TIMEOUT seconds for a slot and get a 503 otherwise. The
+password_hashing.pending metric counts operations queued or running, with
+0 workers everything runs inline.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from plusone import metrics
+
+_EXECUTOR = None
+_EXECUTOR_WORKERS = None
+_LOCK = threading.Lock()
+_SLOTS = None
+_SLOTS_SIZE = None
+
+
+class HashingBusy(APIException):
+    """
+    Every password hashing slot is taken
+    """
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _("Too many password operations, try again later.")
+    default_code = "hashing_busy"
+
+
+def _init_worker(settings_module):
+    """
+    configure settings in a pool process
+    :param settings_module:
+    :return:
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+
+
+def _make_password(password):
+    """
+    hash a password, in a pool process
+    :param password:
+    :return: encoded password
+    """
+    return hashers.make_password(password)
+
+
+def _verify_password(password, encoded):
+    """
+    verify a password, in a pool process
+    :param password:
+    :param encoded:
+    :return: (is_correct, must_update)
+    """
+    return hashers.verify_password(password, encoded)
+
+
+def create_executor(workers):
+    """
+    create a process pool hashing passwords, batch jobs create their own
+    to use with make_passwords
+    :param workers:
+    :return:
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(os.environ["DJANGO_SETTINGS_MODULE"],),
+    )
+
+
+def get_executor():
+    """
+    get the process pool, None when hashing runs inline
+    :return:
+    """
+    # pylint: disable-next=global-statement
+    global _EXECUTOR, _EXECUTOR_WORKERS, _SLOTS, _SLOTS_SIZE
+    workers = settings.PASSWORD_HASHING_WORKERS
+    if not workers:
+        return None
+    with _LOCK:
+        concurrency = settings.PASSWORD_HASHING_CONCURRENCY
+        if _SLOTS is None or _SLOTS_SIZE != concurrency:
+            # operations holding a slot release it on the previous semaphore
+            _SLOTS = threading.BoundedSemaphore(concurrency)
+            _SLOTS_SIZE = concurrency
+        if _EXECUTOR is None or _EXECUTOR_WORKERS != workers:
+            if _EXECUTOR is not None:
+                _EXECUTOR.shutdown(wait=False)
+            _EXECUTOR = create_executor(workers)
+            _EXECUTOR_WORKERS = workers
+        return _EXECUTOR
+
+
+def run(func, *args):
+    """
+    run func in the process pool, within the concurrency limit
+    :param func:
+    :param args:
+    :return: func result
+    """
+    executor = get_executor()
+    if executor is None:
+        return func(*args)
+    slots = _SLOTS
+    metrics.incr("password_hashing.pending")
+    try:
+        if not slots.acquire(timeout=settings.PASSWORD_HASHING_TIMEOUT):
+            metrics.incr("password_hashing.rejected")
+            raise HashingBusy()
+        try:
+            return executor.submit(func, *args).result()
+        finally:
+            slots.release()
+    finally:
+        metrics.incr("password_hashing.pending", -1)
+
+
+def make_password(password):
+    """
+    hash a password off the request worker
+    :param password:
+    :return: encoded password
+    """
+    return run(_make_password, password)
+
+
+def make_passwords(executor, passwords, chunksize=1):
+    """
+    hash passwords in a pool from create_executor, without the request
+    concurrency limit
+    :param executor:
+    :param passwords:
+    :param chunksize:
+    :return: iterator of encoded passwords, in order
+    """
+    return executor.map(_make_password, passwords, chunksize=chunksize)
+
+
+def set_password(user, password):
+    """
+    set the password of a user like user.set_password, hashing off the
+    request worker, so password validators are told of the change on save
+    :param user:
+    :param password:
+    :return:
+    """
+    user.password = make_password(password)
+    # read by AbstractBaseUser.save, which then calls password_changed()
+    user._password = password  # pylint: disable=protected-access
+
+
+def check_password(user, password):
+    """
+    check the password of a user off the request worker, upgrading the
+    stored hash when the hasher settings changed
+    :param user:
+    :param password:
+    :return: whether the password is correct
+    """
+    is_correct, must_update = run(_verify_password, password, user.password)
+    if is_correct and must_update:
+        user.password = make_password(password)
+        user.save(update_fields=["password"])
+    return is_correct
@@ -0,0 +1,119 @@
+"""
+user last login buffer
+
+Token obtain requests record the login time in memory instead of updating
+the user row inline. Pending logins are written with one bulk update every
+LAST_LOGIN_FLUSH_INTERVAL seconds, or as soon as LAST_LOGIN_MAX_PENDING
+users are waiting, so a crash loses at most that much. An interval of 0
+writes every login inline.
+"""
+
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+from plusone import metrics
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+LAST_LOGIN_BATCH_SIZE = 500
+
+
+class LastLoginBuffer:
+    """
+    Pending last_login values, by user id
+    """
+
+    def __init__(self):
+        """
+        Initialize
+        """
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.timer = None
+
+    def record(self, user):
+        """
+        record a login of user
+        :param user:
+        :return:
+        """
+        user.last_login = timezone.now()
+        if not settings.LAST_LOGIN_FLUSH_INTERVAL:
+            User.objects.filter(pk=user.pk).update(last_login=user.last_login)
+            return
+        with self.lock:
+            self.pending[user.pk] = user.last_login
+            full = len(self.pending) >= settings.LAST_LOGIN_MAX_PENDING
+            if not full:
+                self.schedule()
+        if full:
+            self.flush()
+
+    def schedule(self):
+        """
+        start the flush timer unless it is running, called with the lock held
+        :return:
+        """
+        if self.timer is None:
+            self.timer = threading.Timer(
+                settings.LAST_LOGIN_FLUSH_INTERVAL, self.flush_in_thread
+            )
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """
+        write pending logins with one bulk update per batch
+        :return: number of users updated
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not pending:
+            return 0
+        try:
+            User.objects.bulk_update(
+                [
+                    User(pk=user_id, last_login=last_login)
+                    for user_id, last_login in pending.items()
+                ],
+                ["last_login"],
+                batch_size=LAST_LOGIN_BATCH_SIZE,
+            )
+        except DatabaseError:
+            logger.exception("Failed to flush %d last logins", len(pending))
+            metrics.incr("last_login.flush.error")
+            with self.lock:
+                for user_id, last_login in pending.items():
+                    self.pending.setdefault(user_id, last_login)
+                self.schedule()
+            return 0
+        metrics.incr("last_login.flush")
+        metrics.incr("last_login.flushed", len(pending))
+        return len(pending)
+
+    def flush_in_thread(self):
+        """
+        flush from the timer thread, releasing its database connection
+        :return:
+        """
+        with self.lock:
+            self.timer = None
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+
+last_logins = LastLoginBuffer()
+atexit.register(last_logins.flush)
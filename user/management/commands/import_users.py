@@ -0,0 +1,260 @@
+"""
+User command to import users in bulk
+"""
+
+import csv
+import json
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from blog.models import Profile
+from user.hashing import create_executor, make_passwords
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Command to create users from a CSV or JSONL file.
+
+    Every row holds an email and a password, optionally a username (the
+    email local part by default), a first_name and a last_name. Passwords
+    are hashed in parallel, users, profiles and default group memberships
+    are created with bulk inserts, one transaction per batch. The number of
+    rows handled is written to a checkpoint file after every batch, so an
+    interrupted import resumes where it stopped.
+    """
+
+    help = "Import users from a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        """
+        Add arguments
+        :param parser:
+        :return:
+        """
+        parser.add_argument("path", help="CSV or JSONL file of users")
+        parser.add_argument(
+            "--format",
+            choices=("csv", "jsonl"),
+            help="File format, guessed from the file extension by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of users created per transaction",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of processes hashing passwords",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Checkpoint file, defaults to the file path with .checkpoint",
+        )
+
+    @staticmethod
+    def read_rows(path, _format):
+        """
+        Stream rows of the file as dicts
+        :param path:
+        :param _format:
+        :return:
+        """
+        with open(path, newline="", encoding="utf-8") as _file:
+            if _format == "csv":
+                yield from csv.DictReader(_file)
+            else:
+                for line in _file:
+                    if line.strip():
+                        yield json.loads(line)
+
+    @staticmethod
+    def read_checkpoint(path):
+        """
+        Get the number of rows already imported
+        :param path:
+        :return:
+        """
+        try:
+            with open(path, encoding="utf-8") as _file:
+                return json.load(_file)["rows"]
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def write_checkpoint(path, rows):
+        """
+        Save the number of rows imported
+        :param path:
+        :param rows:
+        :return:
+        """
+        with open(path + ".tmp", "w", encoding="utf-8") as _file:
+            json.dump({"rows": rows}, _file)
+        os.replace(path + ".tmp", path)
+
+    def clean_batch(self, rows, first_line):
+        """
+        Validate rows and drop users that already exist
+        :param rows:
+        :param first_line:
+        :return: users to create, with their raw passwords
+        """
+        users = []
+        emails = set()
+        usernames = set()
+        for line, row in enumerate(rows, first_line):
+            email = User.objects.normalize_email((row.get("email") or "").strip())
+            _user = User(
+                email=email,
+                username=(row.get("username") or email.split("@")[0]).strip(),
+                first_name=row.get("first_name") or "",
+                last_name=row.get("last_name") or "",
+            )
+            try:
+                _user.clean_fields(exclude=("password",))
+            except ValidationError as errors:
+                self.stderr.write("Row %d skipped: %s" % (line, errors.messages))
+                continue
+            if email in emails or _user.username in usernames:
+                self.stderr.write("Row %d skipped: duplicated in file" % line)
+                continue
+            emails.add(email)
+            usernames.add(_user.username)
+            users.append((_user, row.get("password") or None))
+
+        existing = set(
+            User.objects.filter(email__in=emails).values_list("email", flat=True)
+        ) | set(
+            User.objects.filter(username__in=usernames).values_list(
+                "username", flat=True
+            )
+        )
+        return [
+            (_user, password)
+            for _user, password in users
+            if _user.email not in existing and _user.username not in existing
+        ]
+
+    def import_batch(self, rows, first_line, executor, workers, groups):
+        """
+        Create the users of a batch in one transaction
+        :param rows:
+        :param first_line:
+        :param executor:
+        :param workers:
+        :param groups:
+        :return: number of users created
+        """
+        users = self.clean_batch(rows, first_line)
+        if not users:
+            return 0
+        passwords = make_passwords(
+            executor,
+            [password for _, password in users],
+            chunksize=max(1, len(users) // (workers * 4)),
+        )
+        for (_user, _), encoded in zip(users, passwords):
+            _user.password = encoded
+
+        with transaction.atomic():
+            User.objects.bulk_create([_user for _user, _ in users])
+            user_ids = list(
+                User.objects.filter(
+                    email__in=[_user.email for _user, _ in users]
+                ).values_list("id", flat=True)
+            )
+            Profile.objects.bulk_create(
+                [Profile(user_id=user_id) for user_id in user_ids]
+            )
+            User.groups.through.objects.bulk_create(
+                [
+                    User.groups.through(user_id=user_id, group_id=group_id)
+                    for user_id in user_ids
+                    for group_id in groups
+                ]
+            )
+        return len(user_ids)
+
+    def handle(self, *args, **options):
+        """
+        Handle command
+        :param args:
+        :param options:
+        :return:
+        """
+        path = options["path"]
+        _format = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if _format not in ("csv", "jsonl"):
+            raise CommandError("Unknown format %r, use --format" % _format)
+        if not os.path.exists(path):
+            raise CommandError("File %s does not exist" % path)
+        checkpoint = options["checkpoint"] or path + ".checkpoint"
+        batch_size = options["batch_size"]
+
+        done = self.read_checkpoint(checkpoint)
+        if done:
+            self.stdout.write("Resuming after %d rows" % done)
+        groups = list(
+            Group.objects.filter(name=settings.DEFAULT_USER_GROUP).values_list(
+                "id", flat=True
+            )
+        )
+
+        workers = max(1, options["workers"])
+        rows_read = 0
+        created = 0
+        started = time.monotonic()
+        with create_executor(workers) as executor:
+            batch = []
+            for row in self.read_rows(path, _format):
+                rows_read += 1
+                if rows_read <= done:
+                    continue
+                batch.append(row)
+                if len(batch) < batch_size:
+                    continue
+                created += self.import_batch(
+                    batch, rows_read - len(batch) + 1, executor, workers, groups
+                )
+                self.write_checkpoint(checkpoint, rows_read)
+                self.report(rows_read - done, started)
+                batch = []
+            if batch:
+                created += self.import_batch(
+                    batch, rows_read - len(batch) + 1, executor, workers, groups
+                )
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Successfully imported %d users, %s"
+                % (created, self.report(rows_read - done, started, write=False))
+            )
+        )
+
+    def report(self, rows, started, write=True):
+        """
+        Report import speed
+        :param rows:
+        :param started:
+        :param write:
+        :return:
+        """
+        elapsed = max(time.monotonic() - started, 1e-6)
+        message = "%d rows in %.1fs (%.0f rows/s)" % (rows, elapsed, rows / elapsed)
+        if write:
+            self.stdout.write(message)
+        return message
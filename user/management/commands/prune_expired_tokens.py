@@ -0,0 +1,76 @@
+"""
+User command to prune expired tokens
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from user.denylist import request_rebuild
+
+
+class Command(BaseCommand):
+    """
+    Command to delete expired outstanding and blacklisted tokens in small
+    batches, each batch in its own short transaction, so the token tables
+    are never locked for long
+    """
+
+    help = "Delete expired outstanding and blacklisted tokens in batches"
+
+    def add_arguments(self, parser):
+        """
+        Add arguments
+        :param parser:
+        :return:
+        """
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of tokens deleted per transaction",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Seconds to wait between batches",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Handle command
+        :param args:
+        :param options:
+        :return:
+        """
+        batch_size = options["batch_size"]
+        now = aware_utcnow()
+        deleted = 0
+        last_id = 0
+        while True:
+            token_ids = list(
+                OutstandingToken.objects.filter(id__gt=last_id, expires_at__lte=now)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not token_ids:
+                break
+            with transaction.atomic():
+                BlacklistedToken.objects.filter(token_id__in=token_ids).delete()
+                OutstandingToken.objects.filter(id__in=token_ids).delete()
+            deleted += len(token_ids)
+            last_id = token_ids[-1]
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        if deleted:
+            request_rebuild()
+        self.stdout.write(
+            self.style.SUCCESS("Successfully deleted %d expired tokens" % deleted)
+        )
@@ -5,6 +5,14 @@ user serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+
+from . import hashing
+from .denylist import is_blacklisted
+from .lastlogin import last_logins
+from .tokens import RefreshToken
 
 User = get_user_model()
 
@@ -49,7 +57,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
             user = User(**validated_data, username=_username)
         except Exception as errors:
             raise serializers.ValidationError(list(errors))
-        user.set_password(_password)
+        hashing.set_password(user, _password)
         user.save()
         return user
 
@@ -130,8 +138,74 @@ class ChangePasswordSerializer(serializers.ModelSerializer):
         """
         _old_password = validated_data.pop("old_password")
         _new_password = validated_data.pop("new_password")
-        if not instance.check_password(_old_password):
+        if not hashing.check_password(instance, _old_password):
             raise serializers.ValidationError({"old_password": "Wrong password."})
-        instance.set_password(_new_password)
+        hashing.set_password(instance, _new_password)
         instance.save()
         return instance
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    """
+    Token obtain pair serializer carrying the user profile id as a claim
+    """
+
+    token_class = RefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        """
+        get token with profile_id claim
+        :param user:
+        :return: refresh token
+        """
+        token = super().get_token(user)
+        profile = getattr(user, "user_profile", None)
+        if profile is not None:
+            token["profile_id"] = profile.pk
+        return token
+
+    def validate(self, attrs):
+        """
+        validate credentials and record the login in the last login buffer
+        :param attrs:
+        :return: tokens
+        """
+        data = super().validate(attrs)
+        last_logins.record(self.user)
+        return data
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """
+    Token refresh serializer checking the in-memory denylist
+    """
+
+    token_class = RefreshToken
+
+
+class TokenBlacklistSerializer(jwt_serializers.TokenBlacklistSerializer):
+    """
+    Token blacklist serializer checking the in-memory denylist
+    """
+
+    token_class = RefreshToken
+
+
+class TokenVerifySerializer(jwt_serializers.TokenVerifySerializer):
+    """
+    Token verify serializer checking the in-memory denylist
+    """
+
+    def validate(self, attrs):
+        """
+        validate token
+        :param attrs:
+        :return:
+        """
+        token = UntypedToken(attrs["token"])
+        if api_settings.BLACKLIST_AFTER_ROTATION and is_blacklisted(
+            token.get(api_settings.JTI_CLAIM)
+        ):
+            raise serializers.ValidationError("Token is blacklisted")
+        return {}
@@ -0,0 +1,40 @@
+"""
+user signals
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import invalidate_cached_user
+from .denylist import announce_blacklisted
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """
+    drop a saved or deleted user from the authentication cache
+    :param sender:
+    :param instance:
+    :param kwargs:
+    :return:
+    """
+    invalidate_cached_user(instance.pk, using=kwargs.get("using"))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, created, **kwargs):
+    """
+    add a newly blacklisted token to the denylist
+    :param sender:
+    :param instance:
+    :param created:
+    :param kwargs:
+    :return:
+    """
+    if created:
+        announce_blacklisted(instance.token.jti, using=kwargs.get("using"))
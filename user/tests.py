@@ -2,11 +2,37 @@
 User tests cases
 """
 
+import json
+import os
+import tempfile
+from base64 import b64encode
+from io import StringIO
+from unittest import mock
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from plusone import metrics
+from user import hashing
+from user.authentication import USER_CACHE_KEY
+from user.denylist import DENYLIST_VERSION_KEY, denylist
+from user.lastlogin import last_logins
 
 
+@override_settings(LAST_LOGIN_FLUSH_INTERVAL=0)
 class UserTestCase(TestCase):
     """
     User test cases
@@ -20,6 +46,7 @@ class UserTestCase(TestCase):
             password="T@eST1926",
         )
         self.client = APIClient()
+        denylist.clear()
 
     def test_user_create_success(self):
         """
@@ -32,6 +59,9 @@ class UserTestCase(TestCase):
         }
         response = self.client.post("/api/auth/create/", body)
         self.assertEqual(response.status_code, 201)
+        self.assertTrue(
+            get_user_model().objects.get(id=response.data["id"]).user_profile.pk
+        )
 
     def test_user_create_invalid_password(self):
         """
@@ -182,3 +212,302 @@ class UserTestCase(TestCase):
             headers={"Authorization": f"Bearer {tokens.data['access']}"},
         )
         self.assertEqual(response.status_code, 200)
+
+    def test_user_cached_authentication(self):
+        """
+        test jwt user is served from the cache and invalidated on update
+        :return:
+        """
+        body = {
+            "email": "exist@test.com",
+            "password": "T@eST1926",
+        }
+        tokens = self.client.post("/api/auth/token/", body)
+        headers = {"Authorization": f"Bearer {tokens.data['access']}"}
+        self.client.get("/api/auth/me/", headers=headers)
+        # the user rendered, authentication is served from the cache
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/auth/me/", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        _user = get_user_model().objects.get(email="exist@test.com")
+        entry = cache.get(USER_CACHE_KEY % _user.pk)
+        self.assertNotIn("password", entry[0])
+        self.assertNotIn(_user.password, str(entry))
+        self.client.patch("/api/auth/me/", {"first_name": "cached"}, headers=headers)
+        response = self.client.get("/api/auth/me/", headers=headers)
+        self.assertEqual(response.data["first_name"], "cached")
+
+        # a concurrent request caching the user before the commit does not
+        # keep it
+        entry = cache.get(USER_CACHE_KEY % _user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            _user.is_active = False
+            _user.save()
+            cache.set(USER_CACHE_KEY % _user.pk, entry)
+        response = self.client.get("/api/auth/me/", headers=headers)
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(BASIC_AUTH_CACHE_TTL=60)
+    def test_basic_auth_cache(self):
+        """
+        test verified basic credentials are cached until the password changes
+        :return:
+        """
+
+        def basic(password):
+            credentials = b64encode(f"exist@test.com:{password}".encode()).decode()
+            return {"Authorization": f"Basic {credentials}"}
+
+        misses = metrics.get("basic_auth.cache.miss")
+        hits = metrics.get("basic_auth.cache.hit")
+        for _ in range(3):
+            response = self.client.get("/api/auth/me/", headers=basic("T@eST1926"))
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(metrics.get("basic_auth.cache.miss"), misses + 1)
+        self.assertEqual(metrics.get("basic_auth.cache.hit"), hits + 2)
+        response = self.client.get("/api/auth/me/", headers=basic("wrong"))
+        self.assertEqual(response.status_code, 401)
+
+        _data = {"old_password": "T@eST1926", "new_password": "ST@eST1926"}
+        response = self.client.put(
+            "/api/auth/me/password/", _data, headers=basic("T@eST1926")
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get("/api/auth/me/", headers=basic("T@eST1926"))
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get("/api/auth/me/", headers=basic("ST@eST1926"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_token_denylist(self):
+        """
+        test blacklist checks are answered from memory
+        :return:
+        """
+        body = {
+            "email": "exist@test.com",
+            "password": "T@eST1926",
+        }
+        tokens = self.client.post("/api/auth/token/", body)
+        refresh = {"refresh": tokens.data["refresh"]}
+        self.client.post("/api/auth/token/refresh/", refresh)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/api/auth/token/refresh/", refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            [query for query in queries if "blacklist" in query["sql"]],
+        )
+
+        response = self.client.post("/api/auth/token/blacklist/", refresh)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post("/api/auth/token/refresh/", refresh)
+        self.assertEqual(response.status_code, 401)
+
+        # a fresh process loads the blacklisted token from the database
+        denylist.clear()
+        response = self.client.post("/api/auth/token/refresh/", refresh)
+        self.assertEqual(response.status_code, 401)
+
+    def test_token_denylist_out_of_order_commit(self):
+        """
+        test rows committed after a higher id was loaded are not missed
+        :return:
+        """
+        _user = get_user_model().objects.get(email="exist@test.com")
+        _expires_at = timezone.now() + timedelta(days=1)
+        _tokens = [
+            OutstandingToken.objects.create(
+                user=_user,
+                jti="jti%d" % index,
+                token="t%d" % index,
+                expires_at=_expires_at,
+            )
+            for index in range(2)
+        ]
+        BlacklistedToken.objects.create(id=100, token=_tokens[0])
+        self.assertIn("jti0", denylist)
+        # another process, whose transaction holds a lower id, commits last
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(id=50, token=_tokens[1])]
+        )
+        cache.set(DENYLIST_VERSION_KEY, "other process")
+        self.assertIn("jti1", denylist)
+
+    def test_token_denylist_periodic_rebuild(self):
+        """
+        test the set is rebuilt from scratch past the rebuild interval
+        :return:
+        """
+        _user = get_user_model().objects.get(email="exist@test.com")
+        _token = OutstandingToken.objects.create(
+            user=_user,
+            jti="old",
+            token="old",
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        BlacklistedToken.objects.create(id=5000, token=_token)
+        self.assertIn("old", denylist)
+        _token.jti = "late"
+        _token.save()
+        BlacklistedToken.objects.filter(id=5000).update(id=1)
+        cache.set(DENYLIST_VERSION_KEY, "other process")
+        self.assertNotIn("late", denylist)
+        with override_settings(TOKEN_DENYLIST_REBUILD_INTERVAL=0):
+            cache.set(DENYLIST_VERSION_KEY, "another process")
+            self.assertIn("late", denylist)
+
+    def test_prune_expired_tokens(self):
+        """
+        test expired tokens are pruned in batches
+        :return:
+        """
+        _user = get_user_model().objects.get(email="exist@test.com")
+        _now = timezone.now()
+        for index in range(5):
+            _token = OutstandingToken.objects.create(
+                user=_user,
+                jti="expired%d" % index,
+                token="expired%d" % index,
+                expires_at=_now - timedelta(days=1),
+            )
+            BlacklistedToken.objects.create(token=_token)
+        OutstandingToken.objects.create(
+            user=_user, jti="valid", token="valid", expires_at=_now + timedelta(days=1)
+        )
+        self.assertIn("expired0", denylist)
+
+        call_command("prune_expired_tokens", batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            list(OutstandingToken.objects.values_list("jti", flat=True)), ["valid"]
+        )
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertNotIn("expired0", denylist)
+
+    @override_settings(LAST_LOGIN_FLUSH_INTERVAL=60, LAST_LOGIN_MAX_PENDING=2)
+    def test_last_login_buffer(self):
+        """
+        test token obtain buffers last_login until the buffer is flushed
+        :return:
+        """
+        self.addCleanup(last_logins.flush)
+        user_model = get_user_model()
+        user_model.objects.create_user(
+            email="other@test.com", username="other", password="T@eST1926"
+        )
+        body = {
+            "email": "exist@test.com",
+            "password": "T@eST1926",
+        }
+        response = self.client.post("/api/auth/token/", body)
+        self.assertEqual(response.status_code, 200)
+        _user = user_model.objects.get(email="exist@test.com")
+        self.assertIsNone(_user.last_login)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(last_logins.flush(), 1)
+        _user.refresh_from_db()
+        self.assertIsNotNone(_user.last_login)
+
+        # reaching LAST_LOGIN_MAX_PENDING flushes without waiting
+        self.client.post("/api/auth/token/", body)
+        body["email"] = "other@test.com"
+        self.client.post("/api/auth/token/", body)
+        self.assertFalse(last_logins.pending)
+        self.assertIsNotNone(user_model.objects.get(email="other@test.com").last_login)
+
+    def test_password_hashing_pool(self):
+        """
+        test passwords are hashed in the pool, within the concurrency limit
+        :return:
+        """
+        encoded = hashing.make_password("T@eST1926")
+        _user = get_user_model()(password=encoded)
+        self.assertTrue(hashing.check_password(_user, "T@eST1926"))
+        self.assertFalse(hashing.check_password(_user, "wrong"))
+        self.assertEqual(metrics.get("password_hashing.pending"), 0)
+
+        body = {
+            "email": "test@test.com",
+            "password": "T@eST1926",
+        }
+        slots = []
+        while hashing._SLOTS.acquire(blocking=False):
+            slots.append(1)
+        try:
+            with override_settings(PASSWORD_HASHING_TIMEOUT=0):
+                response = self.client.post("/api/auth/create/", body)
+        finally:
+            for _ in slots:
+                hashing._SLOTS.release()
+        self.assertEqual(response.status_code, 503)
+        response = self.client.post("/api/auth/create/", body)
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post("/api/auth/token/", body)
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_change_notifies_validators(self):
+        """
+        test passwords set through the pool reach password_changed() and
+        the concurrency limit follows its setting
+        :return:
+        """
+        _user = get_user_model().objects.get(email="exist@test.com")
+        with mock.patch(
+            "django.contrib.auth.base_user.password_validation.password_changed"
+        ) as password_changed:
+            hashing.set_password(_user, "ST@eST1926")
+            _user.save()
+        password_changed.assert_called_once_with("ST@eST1926", _user)
+        self.assertTrue(_user.check_password("ST@eST1926"))
+
+        with override_settings(PASSWORD_HASHING_CONCURRENCY=1):
+            hashing.make_password("T@eST1926")
+            self.assertTrue(hashing._SLOTS.acquire(blocking=False))
+            self.assertFalse(hashing._SLOTS.acquire(blocking=False))
+            hashing._SLOTS.release()
+        hashing.make_password("T@eST1926")
+        self.assertEqual(hashing._SLOTS_SIZE, settings.PASSWORD_HASHING_CONCURRENCY)
+
+    def test_import_users(self):
+        """
+        test users are imported in batches and the import resumes
+        :return:
+        """
+        _group = Group.objects.create(name=settings.DEFAULT_USER_GROUP)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        path = os.path.join(directory, "users.csv")
+        self.addCleanup(os.remove, path)
+        with open(path, "w", encoding="utf-8") as _file:
+            _file.write("email,password,first_name\n")
+            _file.write("skipped@test.com,T@eST1926,skipped\n")
+            for index in range(4):
+                _file.write("import%d@test.com,T@eST1926,import\n" % index)
+            _file.write("exist@test.com,T@eST1926,exist\n")
+            _file.write("invalid,T@eST1926,invalid\n")
+        # an earlier run stopped after the first row
+        with open(path + ".checkpoint", "w", encoding="utf-8") as _file:
+            json.dump({"rows": 1}, _file)
+
+        stdout = StringIO()
+        call_command(
+            "import_users",
+            path,
+            batch_size=2,
+            workers=1,
+            stdout=stdout,
+            stderr=StringIO(),
+        )
+        self.assertIn("Successfully imported 4 users", stdout.getvalue())
+        self.assertIn("rows/s", stdout.getvalue())
+        self.assertFalse(os.path.exists(path + ".checkpoint"))
+
+        _users = get_user_model().objects.filter(first_name="import")
+        self.assertEqual(_users.count(), 4)
+        self.assertFalse(
+            get_user_model().objects.filter(email="skipped@test.com").exists()
+        )
+        for _user in _users:
+            self.assertTrue(_user.check_password("T@eST1926"))
+            self.assertEqual(_user.username, _user.email.split("@")[0])
+            self.assertTrue(_user.user_profile.pk)
+            self.assertEqual(list(_user.groups.all()), [_group])
@@ -0,0 +1,24 @@
+"""
+user tokens
+"""
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from .denylist import is_blacklisted
+
+
+class RefreshToken(tokens.RefreshToken):
+    """
+    Refresh token checked against the in-memory denylist
+    """
+
+    def check_blacklist(self):
+        """
+        raise TokenError when the token is blacklisted
+        :return:
+        """
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
@@ -5,9 +5,12 @@ user views
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.db import transaction
 from rest_framework.generics import CreateAPIView, RetrieveUpdateAPIView, UpdateAPIView
 from rest_framework.permissions import AllowAny
 
+from blog.models import Profile
+
 from .serializers import UserCreateSerializer, UserSerializer, ChangePasswordSerializer
 
 User = get_user_model()
@@ -30,8 +33,10 @@ class UserCreateView(CreateAPIView):
         groups = Group.objects.filter(name=settings.DEFAULT_USER_GROUP).values_list(
             "id", flat=True
         )
-        _user = serializer.save()
-        _user.groups.add(*groups)
+        with transaction.atomic():
+            _user = serializer.save()
+            _user.groups.add(*groups)
+            Profile.objects.create(user=_user)
 
 
 class UserView(RetrieveUpdateAPIView):
@@ -44,10 +49,10 @@ class UserView(RetrieveUpdateAPIView):
 
     def get_object(self):
         """
-        get object
+        get object, the request user holds the authentication fields only
         :return: user object
         """
-        return self.request.user
+        return self.get_queryset().get(pk=self.request.user.pk)
 
 
 class ChangePasswordView(UpdateAPIView):
@@ -61,7 +66,7 @@ class ChangePasswordView(UpdateAPIView):
 
     def get_object(self):
         """
-        get object
+        get object, the request user holds the authentication fields only
         :return: user object
         """
-        return self.request.user
+        return self.get_queryset().get(pk=self.request.user.pk)